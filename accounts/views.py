@@ -4,10 +4,12 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_POST
+from pykart.querycount import query_budget
 from .forms import UserRegistrationForm, UserLoginForm, AddressForm
 from .models import Address, UserProfile
 
 
+@query_budget(22)
 def register(request):
     """User registration view"""
     if request.user.is_authenticated:
@@ -33,6 +35,7 @@ def register(request):
     return render(request, 'accounts/register.html', {'form': form})
 
 
+@query_budget(22)
 def user_login(request):
     """User login view"""
     if request.user.is_authenticated:
@@ -59,7 +62,7 @@ def user_login(request):
             
             if user:
                 login(request, user)
-                messages.success(request, f'Welcome back, {username}!')
+                messages.success(request, f'Welcome back, {user.username}!')
                 # Redirect to next page if specified, otherwise home
                 next_url = request.GET.get('next')
                 if next_url:
@@ -76,6 +79,7 @@ def user_login(request):
 
 
 @login_required
+@query_budget(4)
 def address_list(request):
     """List all addresses for the user"""
     addresses = Address.objects.filter(user=request.user)
@@ -134,6 +138,7 @@ def address_delete(request, address_id):
 
 
 @login_required
+@query_budget(5)
 def profile(request):
     """User profile page"""
     profile_obj, created = UserProfile.objects.get_or_create(user=request.user)
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from .models import ArchivedOrder, ArchivedOrderItem
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ['product_name', 'product_price', 'quantity', 'subtotal']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user_id', 'total', 'status', 'payment_status', 'created_at', 'archived_at']
+    list_filter = ['status', 'payment_status']
+    search_fields = ['order_number', 'shipping_name']
+    date_hierarchy = 'created_at'
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,125 @@
+"""
+Hot/cold storage for orders.
+
+Orders only grow, but once an order is delivered or cancelled and has not
+changed for ORDER_ARCHIVE_AFTER it is only ever looked up by its number.
+``archive_orders`` moves such orders, with their items and invoice, out of
+the orders tables into the archive tables, batch by batch, so the tables
+that checkout, order history and the admin work on stay small.  The
+archive tables live in the ``archive`` database when one is configured
+(see archive.routers), otherwise next to the orders tables.
+
+Batches are taken in id order, each starting after the last order the
+previous one looked at, so orders that cannot be moved yet never stall
+the run.  A batch is first copied (replacing any copy a previous,
+interrupted run left behind) and then deleted from the orders tables,
+each in its own transaction.  A crash between the two leaves an order in both places,
+never in neither, and the next run finishes the move; lookups always try
+the hot tables first, so the duplicate is never seen.
+
+``find_order`` looks an order up by number in the hot tables, then in the
+archive.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from orders import invoices
+from orders.models import Order, OrderItem
+from .models import ArchivedInvoice, ArchivedOrder, ArchivedOrderItem
+from .routers import archive_database
+
+
+FINISHED_STATUSES = ['delivered', 'cancelled']
+
+DEFAULT_ARCHIVE_AFTER = timedelta(days=180)
+DEFAULT_BATCH_SIZE = 500
+
+
+def _copy_of(source, model, exclude=()):
+    """An unsaved ``model`` instance with the field values of ``source``"""
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in exclude:
+            continue
+        value = getattr(source, field.attname)
+        # Files are shared, not copied: keep the stored name
+        values[field.attname] = value.name if isinstance(field, models.FileField) else value
+    return model(**values)
+
+
+def archivable(older_than=None):
+    """Finished orders that have not changed for ``older_than``"""
+    older_than = older_than or getattr(settings, 'ORDER_ARCHIVE_AFTER', DEFAULT_ARCHIVE_AFTER)
+    return Order.objects.filter(status__in=FINISHED_STATUSES, updated_at__lt=timezone.now() - older_than)
+
+
+def _copy(orders):
+    """Write archive copies of ``orders``, replacing existing ones"""
+    ids = [order.pk for order in orders]
+    items = OrderItem.objects.filter(order_id__in=ids).order_by()
+    with transaction.atomic(using=archive_database()):
+        ArchivedOrder.objects.filter(pk__in=ids).delete()
+        ArchivedOrder.objects.bulk_create([
+            _copy_of(order, ArchivedOrder, exclude={'archived_at'}) for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([_copy_of(item, ArchivedOrderItem) for item in items])
+        ArchivedInvoice.objects.bulk_create([_copy_of(order.invoice, ArchivedInvoice) for order in orders])
+
+
+def archive_batch(batch_size=None, older_than=None, after=0):
+    """
+    Move one batch of archivable orders with ids above ``after``.  Returns
+    the number moved and the last id looked at (None if there was none).
+    """
+    batch_size = batch_size or getattr(settings, 'ORDER_ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    orders = list(
+        archivable(older_than).filter(pk__gt=after).select_related('invoice').order_by('pk')[:batch_size]
+    )
+    if not orders:
+        return 0, None
+    for order in orders:
+        # The invoice files are kept, so make sure they are current first
+        invoices.current_invoice(order)
+    _copy(orders)
+    ids = [order.pk for order in orders]
+    with transaction.atomic():
+        # Orders that changed since they were read are no longer archivable and stay hot
+        archivable(older_than).filter(pk__in=ids).delete()
+        kept = list(Order.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    if kept:
+        ArchivedOrder.objects.filter(pk__in=kept).delete()
+    return len(ids) - len(kept), ids[-1]
+
+
+def archive_orders(batch_size=None, older_than=None, pause=0, max_batches=None):
+    """
+    Move every archivable order to the archive, a batch at a time in id
+    order, sleeping ``pause`` seconds between batches.  Safe to interrupt
+    and run again.
+    """
+    started = time.monotonic()
+    moved = batches = 0
+    last = 0
+    while max_batches is None or batches < max_batches:
+        count, last = archive_batch(batch_size, older_than, after=last)
+        if last is None:
+            break
+        # A batch whose orders all changed meanwhile moves nothing; carry on past it
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return {'orders': moved, 'batches': batches, 'seconds': time.monotonic() - started}
+
+
+def find_order(order_number, **filters):
+    """The order with this number, hot or archived; raises Order.DoesNotExist"""
+    for queryset in (Order.objects, ArchivedOrder.objects):
+        order = queryset.select_related('invoice').filter(order_number=order_number, **filters).first()
+        if order is not None:
+            return order
+    raise Order.DoesNotExist(f'No order {order_number}')
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from archive.archiver import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move delivered and cancelled orders that have not changed for a while to the archive, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Orders moved per batch (default ORDER_ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--days', type=int, help='Archive orders unchanged for this many days (default ORDER_ARCHIVE_AFTER)')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches; run again to resume')
+
+    def handle(self, *args, **options):
+        result = archive_orders(
+            batch_size=options['batch_size'],
+            older_than=timedelta(days=options['days']) if options['days'] is not None else None,
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+        )
+        rate = result['orders'] / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['orders']} orders in {result['batches']} batches, "
+            f"{result['seconds']:.2f}s ({rate:.0f} orders/s)."
+        ))
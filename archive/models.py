@@ -0,0 +1,90 @@
+"""
+Cold copies of finished orders (see archive.archiver).
+
+The rows keep the primary keys they had in the orders tables, and the
+same field names and choices, so the order templates and views can show an
+ArchivedOrder wherever they show an Order.  Users and products live in the
+default database, which may not be this one, so their foreign keys have no
+database constraint.
+"""
+from django.contrib.auth.models import User
+from django.db import models
+
+from orders.models import Order
+from store.models import Product
+
+
+class ArchivedOrder(models.Model):
+    """A delivered or cancelled order moved out of orders.Order"""
+    STATUS_CHOICES = Order.STATUS_CHOICES
+    PAYMENT_STATUS_CHOICES = Order.PAYMENT_STATUS_CHOICES
+
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+
+    shipping_name = models.CharField(max_length=100)
+    shipping_phone = models.CharField(max_length=17)
+    shipping_address_line1 = models.CharField(max_length=200)
+    shipping_address_line2 = models.CharField(max_length=200, blank=True)
+    shipping_city = models.CharField(max_length=100)
+    shipping_state = models.CharField(max_length=100)
+    shipping_postal_code = models.CharField(max_length=20)
+    shipping_country = models.CharField(max_length=100)
+
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    tax = models.DecimalField(max_digits=10, decimal_places=2)
+    shipping_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES)
+    payment_method = models.CharField(max_length=50)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_order_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.order_number}"
+
+    get_shipping_address = Order.get_shipping_address
+
+
+class ArchivedOrderItem(models.Model):
+    """A line of an archived order"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                                related_name='+')
+    product_name = models.CharField(max_length=200)
+    product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name} in archived order {self.order_id}"
+
+
+class ArchivedInvoice(models.Model):
+    """The invoice files of an archived order; they stay where orders.invoices stored them"""
+    order = models.OneToOneField(ArchivedOrder, on_delete=models.CASCADE, primary_key=True, related_name='invoice')
+    html = models.FileField(upload_to='invoices/', blank=True)
+    html_digest = models.CharField(max_length=64, blank=True)
+    pdf = models.FileField(upload_to='invoices/', blank=True)
+    pdf_digest = models.CharField(max_length=64, blank=True)
+    rendered_state = models.CharField(max_length=50, blank=True)
+    rendered_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Invoice for archived order {self.order_id}"
@@ -0,0 +1,42 @@
+from django.conf import settings
+
+
+def archive_database():
+    """Alias of the database holding the archive tables"""
+    return 'archive' if 'archive' in settings.DATABASES else 'default'
+
+
+class ArchiveRouter:
+    """
+    Sends the archive app to the ``archive`` database when one is
+    configured.  Users and products that archived rows refer to are read
+    from the default database.
+    """
+    app_label = 'archive'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return archive_database()
+        instance = hints.get('instance')
+        if instance is not None and instance._meta.app_label == self.app_label:
+            return 'default'
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return archive_database()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.app_label in (obj1._meta.app_label, obj2._meta.app_label):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if archive_database() == 'default':
+            return None
+        if app_label == self.app_label:
+            return db == 'archive'
+        if db == 'archive':
+            return False
+        return None
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, StockReservation
 
 
 class CartItemInline(admin.TabularInline):
@@ -10,24 +10,28 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'session_key', 'get_item_count', 'get_total', 'created_at']
+    list_display = ['id', 'user', 'session_key', 'item_count', 'get_total', 'created_at']
+    list_select_related = ['user']
     list_filter = ['created_at']
     search_fields = ['user__username', 'session_key']
     inlines = [CartItemInline]
-    readonly_fields = ['created_at', 'updated_at']
-
-    def get_item_count(self, obj):
-        return obj.get_item_count()
-    get_item_count.short_description = 'Items'
+    readonly_fields = ['item_count', 'total', 'version', 'created_at', 'updated_at']
 
     def get_total(self, obj):
-        return f"₹{obj.get_total():.2f}"
+        return f"₹{obj.total:.2f}"
     get_total.short_description = 'Total'
+    get_total.admin_order_field = 'total'
+
+    def save_related(self, request, form, formsets, change):
+        # Inline edits bypass the Cart item methods
+        super().save_related(request, form, formsets, change)
+        Cart.objects.filter(pk=form.instance.pk).recalculate()
 
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['id', 'cart', 'product', 'quantity', 'get_subtotal', 'created_at']
+    list_select_related = ['cart__user', 'product']
     list_filter = ['created_at']
     search_fields = ['product__name', 'cart__user__username']
     readonly_fields = ['created_at', 'updated_at']
@@ -36,3 +40,24 @@ class CartItemAdmin(admin.ModelAdmin):
         return f"₹{obj.get_subtotal():.2f}"
     get_subtotal.short_description = 'Subtotal'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Cart.objects.filter(pk=obj.cart_id).recalculate()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Cart.objects.filter(pk=obj.cart_id).recalculate()
+
+    def delete_queryset(self, request, queryset):
+        cart_ids = list(queryset.values_list('cart_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        Cart.objects.filter(pk__in=cart_ids).recalculate()
+
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'cart', 'product', 'quantity', 'expires_at']
+    list_select_related = ['cart__user', 'product']
+    list_filter = ['expires_at']
+    search_fields = ['product__name', 'cart__user__username']
@@ -0,0 +1,150 @@
+"""
+Batched cart mutations.
+
+``apply_batch`` takes a list of operations such as
+
+    [{"op": "add", "product_id": 3, "quantity": 2},
+     {"op": "update", "item_id": 17, "quantity": 5},
+     {"op": "remove", "item_id": 18}]
+
+folds them into the final quantity of every touched product and applies the
+result in one transaction: one read of the cart's items, one ``id__in``
+read of the touched products for the stock check, the stock holds for the
+new quantities (see cart.reservations), then bulk_create /
+bulk_update / delete and a single F() update of the cart summary.  The
+query count does not depend on the number of operations.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from store.models import Product
+from .models import CartItem
+from .reservations import InsufficientStock, hold
+
+
+MAX_OPERATIONS = 100
+
+OPERATIONS = ('add', 'update', 'remove')
+
+
+class CartBatchError(ValueError):
+    """The batch was rejected; ``errors`` lists the reasons"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    number = int(value)
+    if number < 1:
+        raise ValueError
+    return number
+
+
+def parse_operations(operations):
+    """Validate the shape of a batch; returns a list of (op, key, quantity)"""
+    if not isinstance(operations, list) or not operations:
+        raise CartBatchError(['operations must be a non-empty list'])
+    if len(operations) > MAX_OPERATIONS:
+        raise CartBatchError([f'at most {MAX_OPERATIONS} operations per batch'])
+
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        try:
+            op = operation.get('op')
+            if op not in OPERATIONS:
+                raise ValueError
+            if op == 'add':
+                parsed.append((op, _positive_int(operation['product_id']), _positive_int(operation.get('quantity', 1))))
+            elif op == 'update':
+                parsed.append((op, _positive_int(operation['item_id']), _positive_int(operation['quantity'])))
+            else:
+                parsed.append((op, _positive_int(operation['item_id']), 0))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            errors.append(f'operation {index} is invalid')
+    if errors:
+        raise CartBatchError(errors)
+    return parsed
+
+
+def apply_batch(cart, operations):
+    """
+    Apply a batch of operations to ``cart`` atomically.
+
+    Returns the touched items as {product_id: CartItem or None (removed)};
+    raises CartBatchError, leaving the cart untouched, if any operation is
+    invalid or would exceed the stock.
+    """
+    operations = parse_operations(operations)
+    with transaction.atomic():
+        items = {item.product_id: item for item in CartItem.objects.select_for_update().filter(cart=cart)}
+        items_by_id = {item.pk: item for item in items.values()}
+
+        quantities = {}
+        errors = []
+        for op, key, quantity in operations:
+            if op == 'add':
+                current = quantities.get(key, items[key].quantity if key in items else 0)
+                quantities[key] = current + quantity
+                continue
+            item = items_by_id.get(key)
+            if item is None:
+                errors.append(f'item {key} is not in the cart')
+                continue
+            quantities[item.product_id] = quantity
+
+        products = Product.objects.only('id', 'name', 'price', 'stock', 'is_active').in_bulk(quantities)
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if quantity == 0:
+                continue
+            if product is None or (product_id not in items and not product.is_active):
+                errors.append(f'product {product_id} is not available')
+            elif quantity > product.stock:
+                errors.append(f'Only {product.stock} of {product.name} available in stock.')
+        if errors:
+            raise CartBatchError(errors)
+        try:
+            hold(cart, {products[product_id]: quantity for product_id, quantity in quantities.items() if product_id in products})
+        except InsufficientStock as exc:
+            raise CartBatchError(exc.errors)
+
+        now = timezone.now()
+        to_create, to_update, to_delete = [], [], []
+        quantity_delta, amount_delta = 0, 0
+        touched = {}
+        for product_id, quantity in quantities.items():
+            item = items.get(product_id)
+            previous = item.quantity if item else 0
+            if quantity == previous:
+                item.product = products[product_id]
+                touched[product_id] = item
+                continue
+            quantity_delta += quantity - previous
+            amount_delta += (quantity - previous) * products[product_id].price
+            if quantity == 0:
+                to_delete.append(item.pk)
+                touched[product_id] = None
+            elif item is None:
+                item = CartItem(cart=cart, product=products[product_id], quantity=quantity)
+                to_create.append(item)
+                touched[product_id] = item
+            else:
+                item.quantity = quantity
+                item.updated_at = now
+                item.product = products[product_id]
+                to_update.append(item)
+                touched[product_id] = item
+
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+        if quantity_delta or amount_delta:
+            cart.adjust_summary(quantity_delta, amount_delta)
+    return touched
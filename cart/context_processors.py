@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .storage import get_cart_storage
+
+
+def cart_summary(request):
+    """
+    Cart badge count for base.html, read from the cached cart summary.
+
+    Evaluated lazily, and visitors without a cart cost no query at all.
+    """
+    def count():
+        cart = get_cart_storage(request).get()
+        return cart.item_count if cart else 0
+
+    return {'cart_count': SimpleLazyObject(count)}
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cart.reaper import reap
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned anonymous carts, expired stock holds and expired sessions in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows deleted per transaction (default CART_REAPER_BATCH_SIZE)')
+        parser.add_argument('--days', type=int, help='Reap anonymous carts untouched for this many days (default CART_ABANDONED_AFTER)')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+        parser.add_argument('--keep-sessions', action='store_true', help='Only reap carts, leave expired sessions alone')
+
+    def handle(self, *args, **options):
+        result = reap(
+            batch_size=options['batch_size'],
+            abandoned_after=timedelta(days=options['days']) if options['days'] is not None else None,
+            sessions=not options['keep_sessions'],
+            pause=options['pause'],
+        )
+        rows = result['carts'] + result['items'] + result['reservations'] + result['sessions']
+        rate = rows / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Reaped {result['carts']} carts, {result['items']} cart items, {result['reservations']} stock holds "
+            f"and {result['sessions']} sessions "
+            f"in {result['batches']} batches, {result['seconds']:.2f}s ({rate:.0f} rows/s)."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cached item count and total of every cart from its items'
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.recalculate()
+        self.stdout.write(self.style.SUCCESS(f'Recalculated {carts} carts.'))
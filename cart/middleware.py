@@ -0,0 +1,17 @@
+class SessionKeyMiddleware:
+    """
+    Remember the session key each request arrived with.
+
+    ``login()`` cycles the session key before ``user_logged_in`` is sent,
+    so ``cart.signals.merge_session_cart`` needs this to find an anonymous
+    cart that is only linked to the session by its ``session_key``.  Must
+    come after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Reading the key does not load the session
+        request.arrival_session_key = request.session.session_key
+        return self.get_response(request)
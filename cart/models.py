@@ -1,17 +1,55 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
 from django.contrib.auth.models import User
 from store.models import Product
 
 
+# Default of Cart.add_item(item=...): the caller has not looked the line up
+_LOOK_UP = object()
+
+
+class CartQuerySet(models.QuerySet):
+    def recalculate(self):
+        """Recompute the cached summary of these carts from their items"""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.update(
+            item_count=Coalesce(Subquery(items.annotate(count=Sum('quantity')).values('count')), 0),
+            total=Coalesce(
+                Subquery(items.annotate(total=Sum(F('quantity') * F('product__price'))).values('total')),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            version=F('version') + 1,
+        )
+
+
 class Cart(models.Model):
     """Shopping cart model"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='carts')
     session_key = models.CharField(max_length=40, null=True, blank=True)  # For anonymous users
+    # Cached summary of the items, kept in step by the item methods below
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
+    SUMMARY_FIELDS = ['item_count', 'total', 'version']
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Session cart lookups
+            models.Index(fields=['session_key'], name='cart_session_key_idx'),
+            # The reaper walks anonymous carts (user IS NULL) oldest first
+            models.Index(fields=['user', 'updated_at'], name='cart_user_updated_idx'),
+        ]
 
     def __str__(self):
         if self.user:
@@ -19,12 +57,107 @@ class Cart(models.Model):
         return f"Cart (Session: {self.session_key[:10]}...)"
 
     def get_total(self):
-        """Calculate total price of all items in cart"""
-        return sum(item.get_subtotal() for item in self.items.all())
+        """Total price of all items in cart"""
+        return self.total
 
     def get_item_count(self):
-        """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        """Total number of items in cart"""
+        return self.item_count
+
+    def refresh_summary(self):
+        """Re-read the cached summary (one primary-key read)"""
+        self.refresh_from_db(fields=self.SUMMARY_FIELDS)
+
+    def adjust_summary(self, quantity_delta, amount_delta):
+        """Shift the cached summary by the given deltas and bump the version"""
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=F('item_count') + quantity_delta,
+            total=F('total') + amount_delta,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        self.refresh_summary()
+
+    # Every item mutation goes through these methods, which adjust the
+    # summary with F() deltas in the same transaction as the item write.
+    def add_item(self, product, quantity, item=_LOOK_UP):
+        """
+        Add ``quantity`` of ``product``, merging with an existing line.
+
+        A caller that already looked up the cart's line for ``product``
+        passes it as ``item`` (None if there is none) to save the lookup.
+        """
+        if item is not None and item is not _LOOK_UP:
+            item.product = product
+            return self.set_quantity(item, item.quantity + quantity)
+        with transaction.atomic():
+            if item is None:
+                item, created = CartItem.objects.create(cart=self, product=product, quantity=quantity), True
+            else:
+                item, created = CartItem.objects.get_or_create(
+                    cart=self, product=product, defaults={'quantity': quantity},
+                )
+            if not created:
+                return self.set_quantity(item, item.quantity + quantity)
+            self.adjust_summary(quantity, quantity * product.price)
+        return item
+
+    def set_quantity(self, item, quantity):
+        """Change the quantity of one of this cart's items"""
+        with transaction.atomic():
+            delta = quantity - item.quantity
+            item.quantity = quantity
+            item.save(update_fields=['quantity', 'updated_at'])
+            self.adjust_summary(delta, delta * item.product.price)
+        return item
+
+    def remove_item(self, item):
+        """Delete one of this cart's items and release its stock hold"""
+        price = item.product.price
+        with transaction.atomic():
+            item.delete()
+            self.reservations.filter(product_id=item.product_id).delete()
+            self.adjust_summary(-item.quantity, -item.quantity * price)
+
+    def absorb(self, other_id):
+        """
+        Move the items of cart ``other_id`` into this cart and delete it.
+
+        Lines for a product already in this cart are summed, capped at the
+        product's stock (but never below this cart's own quantity); other
+        lines are capped at the stock, and dropped if there is none.  Runs a
+        fixed number of set-based queries however many items are moved.
+        """
+        other_items = CartItem.objects.filter(cart_id=other_id)
+        stock = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('stock')[:1])
+        with transaction.atomic():
+            CartItem.objects.filter(cart=self, product_id__in=other_items.values('product_id')).update(
+                quantity=Greatest(
+                    Least(
+                        F('quantity') + Subquery(
+                            other_items.filter(product_id=OuterRef('product_id')).values('quantity')[:1]
+                        ),
+                        stock,
+                    ),
+                    F('quantity'),
+                ),
+                updated_at=timezone.now(),
+            )
+            # Lines for out-of-stock products are left behind and go with the other cart
+            other_items.exclude(product_id__in=self.items.values('product_id')).filter(product__stock__gt=0).update(
+                cart=self, quantity=Least(F('quantity'), stock), updated_at=timezone.now(),
+            )
+            Cart.objects.filter(pk=other_id).exclude(pk=self.pk).delete()
+            Cart.objects.filter(pk=self.pk).recalculate()
+            self.refresh_summary()
+
+    def clear(self):
+        """Delete every item and release the stock held for them"""
+        with transaction.atomic():
+            self.items.all().delete()
+            self.reservations.all().delete()
+            Cart.objects.filter(pk=self.pk).update(item_count=0, total=0, version=F('version') + 1, updated_at=timezone.now())
+            self.refresh_summary()
 
 
 class CartItem(models.Model):
@@ -46,3 +179,25 @@ class CartItem(models.Model):
         """Calculate subtotal for this item"""
         return self.product.price * self.quantity
 
+
+
+class StockReservation(models.Model):
+    """A time-boxed hold on units of a product for one cart (see cart.reservations)"""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product_reservation'),
+        ]
+        indexes = [
+            # Sum of a product's live holds
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_idx'),
+            # The sweeper walks expired holds oldest first
+            models.Index(fields=['expires_at'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} held for cart {self.cart_id} until {self.expires_at:%H:%M}"
@@ -0,0 +1,158 @@
+"""
+Reclaiming abandoned anonymous carts, expired stock holds and sessions.
+
+Anonymous carts are only reachable through the visitor's session (see
+``cart.storage``), so a cart is garbage once its session has expired or
+been deleted, and any anonymous cart untouched for ``CART_ABANDONED_AFTER``
+is treated as abandoned whatever its session says (signed-cookie sessions
+cannot be checked at all).  Carts touched within the last ``GRACE`` are
+never reaped, which covers the moment between creating a session and
+creating its cart.
+
+``reap`` works in batches of ``batch_size`` rows, oldest first along the
+(user, updated_at) index, each deleted in its own short transaction so the
+reaper never holds locks for long or builds one huge DELETE.  The items go
+with their carts in the same cascade.  Expired stock reservations (which
+already stopped counting when they expired, see ``cart.reservations``)
+and, when sessions live in the database, expired rows of
+``django_session`` are then purged the same way.
+
+``manage.py reap_carts`` runs it once; setting ``CART_REAPER_INTERVAL``
+(seconds) also runs it periodically in a daemon thread of every web
+process, see ``start_scheduler``.  Batches are idempotent, so several
+processes reaping at once only waste a little work.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Cart, StockReservation
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ABANDONED_AFTER = timedelta(days=30)
+DEFAULT_BATCH_SIZE = 500
+GRACE = timedelta(hours=1)
+
+DATABASE_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _sessions_in_database():
+    return settings.SESSION_ENGINE in DATABASE_SESSION_ENGINES
+
+
+def stale_carts(now=None, abandoned_after=None):
+    """Anonymous carts that can no longer be reached or have been abandoned"""
+    now = now or timezone.now()
+    if abandoned_after is None:
+        abandoned_after = getattr(settings, 'CART_ABANDONED_AFTER', DEFAULT_ABANDONED_AFTER)
+    stale = Q(updated_at__lt=now - abandoned_after)
+    if _sessions_in_database():
+        live_session = Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gte=now)
+        stale |= ~Exists(live_session)
+    return Cart.objects.filter(stale, user=None, updated_at__lt=now - GRACE)
+
+
+def _delete_in_batches(queryset, batch_size, pause, order_by):
+    """Delete ``queryset`` ``batch_size`` rows at a time; returns (deleted per model, batches)"""
+    deleted, batches = {}, 0
+    while True:
+        keys = list(queryset.order_by(order_by).values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return deleted, batches
+        with transaction.atomic():
+            # Re-apply the filter: a cart may have been touched since it was picked
+            _, per_model = queryset.filter(pk__in=keys).delete()
+        for label, count in per_model.items():
+            deleted[label] = deleted.get(label, 0) + count
+        batches += 1
+        if len(keys) < batch_size:
+            return deleted, batches
+        if pause:
+            time.sleep(pause)
+
+
+def reap(batch_size=None, abandoned_after=None, sessions=True, pause=0):
+    """
+    Delete stale anonymous carts (with their items), expired stock holds
+    and expired sessions.
+
+    Returns a dict with the rows reclaimed per kind, the number of batches
+    and the elapsed seconds.
+    """
+    batch_size = batch_size or getattr(settings, 'CART_REAPER_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    started = time.monotonic()
+    now = timezone.now()
+
+    deleted, batches = _delete_in_batches(stale_carts(now, abandoned_after), batch_size, pause, 'updated_at')
+    result = {
+        'carts': deleted.get('cart.Cart', 0),
+        'items': deleted.get('cart.CartItem', 0),
+        'reservations': deleted.get('cart.StockReservation', 0),
+        'sessions': 0,
+    }
+    deleted, reservation_batches = _delete_in_batches(
+        StockReservation.objects.filter(expires_at__lt=now), batch_size, pause, 'expires_at'
+    )
+    result['reservations'] += deleted.get('cart.StockReservation', 0)
+    batches += reservation_batches
+    if sessions and _sessions_in_database():
+        deleted, session_batches = _delete_in_batches(
+            Session.objects.filter(expire_date__lt=now), batch_size, pause, 'expire_date'
+        )
+        result['sessions'] = deleted.get('sessions.Session', 0)
+        batches += session_batches
+
+    result['batches'] = batches
+    result['seconds'] = time.monotonic() - started
+    return result
+
+
+def _run(interval):
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            result = reap()
+            if result['carts'] or result['reservations'] or result['sessions']:
+                logger.info(
+                    'Reaped %(carts)d carts, %(items)d items, %(reservations)d stock holds '
+                    'and %(sessions)d sessions in %(seconds).2fs',
+                    result,
+                )
+        except Exception:
+            logger.exception('Cart reaper failed')
+        finally:
+            close_old_connections()
+
+
+def start_scheduler(interval=None):
+    """
+    Reap every ``interval`` seconds (default ``CART_REAPER_INTERVAL``) in a
+    daemon thread; does nothing if no interval is configured or the thread
+    is already running in this process.
+    """
+    global _scheduler
+    if interval is None:
+        interval = getattr(settings, 'CART_REAPER_INTERVAL', None)
+    if not interval:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=_run, args=(interval,), name='cart-reaper', daemon=True)
+            _scheduler.start()
+    return _scheduler
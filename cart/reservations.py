@@ -0,0 +1,162 @@
+"""
+Time-boxed stock reservations.
+
+Adding to the cart takes a hold on the units for ``CART_RESERVATION_TTL``
+(one StockReservation row per cart and product, renewed whenever the line
+changes).  What a cart may still take is the product's stock minus the
+*live* holds of every other cart, summed over the (product, expires_at)
+index, so an expired hold stops counting the moment it expires; the
+reaper (``cart.reaper``) only deletes the dead rows.  Deleting a cart or
+one of its lines deletes its holds, so nothing ever needs to be handed
+back by hand.
+
+Holds never write to the Product row, so buyers competing for one SKU
+contend on nothing but their own reservation rows.  Under a flash sale
+most requests for a sold-out product are rejected before any write: the
+held total of each product is cached for ``HELD_CACHE_TIMEOUT`` seconds,
+refreshed by every successful hold and dropped when holds shrink.  The
+exact check always runs in the database.
+
+At checkout, ``commit`` takes the cart's quantities out of stock with
+guarded decrements (``store.inventory``) that leave enough units for the
+other carts' live holds, and the cleared cart releases its own.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from store import inventory
+from store.models import Product
+from .models import StockReservation
+
+
+DEFAULT_TTL = timedelta(minutes=15)
+HELD_CACHE_TIMEOUT = 5
+
+
+class InsufficientStock(ValueError):
+    """Some holds could not be taken; ``errors`` explains each shortage"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def _ttl():
+    return getattr(settings, 'CART_RESERVATION_TTL', DEFAULT_TTL)
+
+
+def _held_key(product_id):
+    return f'stock:held:{product_id}'
+
+
+def _shortage(product, available):
+    return f'Only {max(available, 0)} of {product.name} available in stock.'
+
+
+def held(now=None, product=None, exclude_cart=None):
+    """Expression for the units of ``product`` (default: the outer row) held by live reservations"""
+    reservations = StockReservation.objects.filter(
+        product=OuterRef('pk') if product is None else product,
+        expires_at__gt=now or timezone.now(),
+    )
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart=exclude_cart)
+    return Coalesce(
+        Subquery(reservations.order_by().values('product').annotate(total=Sum('quantity')).values('total')),
+        0,
+    )
+
+
+def hold(cart, quantities):
+    """
+    Hold ``quantities`` ({product: quantity the cart will contain}) for
+    ``cart``, renewing the expiry; a quantity of 0 releases the hold.
+
+    Raises InsufficientStock, leaving the cart's holds as they were, if
+    the other carts' live holds leave too little stock for any product.
+    Runs a fixed number of queries however many products are held.
+    """
+    now = timezone.now()
+    products = {product.pk: product for product in quantities}
+    wanted = {product.pk: quantity for product, quantity in quantities.items()}
+    own = {
+        reservation.product_id: reservation
+        for reservation in StockReservation.objects.filter(cart=cart, product_id__in=wanted)
+    }
+
+    # Units each product currently has held for this cart
+    live = {
+        product_id: reservation.quantity if reservation.expires_at > now else 0
+        for product_id, reservation in own.items()
+    }
+    increases = {
+        product_id: quantity - live.get(product_id, 0)
+        for product_id, quantity in wanted.items() if quantity > live.get(product_id, 0)
+    }
+
+    # Cheap rejection from the cached totals (which include this cart's live hold)
+    cached = cache.get_many([_held_key(product_id) for product_id in increases])
+    errors = []
+    for product_id, delta in increases.items():
+        total = cached.get(_held_key(product_id))
+        if total is not None and products[product_id].stock - total < delta:
+            errors.append(_shortage(products[product_id], products[product_id].stock - total + live.get(product_id, 0)))
+    if errors:
+        raise InsufficientStock(errors)
+
+    expires_at = now + _ttl()
+    # No savepoint: callers wrap the hold and the cart write in one transaction
+    with transaction.atomic(savepoint=False):
+        to_create, to_update, to_delete = [], [], []
+        for product_id, quantity in wanted.items():
+            reservation = own.get(product_id)
+            if quantity == 0:
+                if reservation is not None:
+                    to_delete.append(reservation.pk)
+            elif reservation is None:
+                to_create.append(StockReservation(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at))
+            else:
+                reservation.quantity, reservation.expires_at = quantity, expires_at
+                to_update.append(reservation)
+        if to_create:
+            StockReservation.objects.bulk_create(to_create)
+        if to_update:
+            StockReservation.objects.bulk_update(to_update, ['quantity', 'expires_at'])
+        if to_delete:
+            StockReservation.objects.filter(pk__in=to_delete).delete()
+
+        if increases:
+            totals = {}
+            rows = Product.objects.filter(pk__in=increases).annotate(held=held(now)).values_list('pk', 'stock', 'held')
+            for product_id, stock, total in rows:
+                others = total - wanted[product_id]
+                if total > stock:
+                    errors.append(_shortage(products[product_id], stock - others))
+                    # What stays held once this transaction rolls back
+                    total = others + live.get(product_id, 0)
+                totals[_held_key(product_id)] = total
+            cache.set_many(totals, HELD_CACHE_TIMEOUT)
+            if errors:
+                raise InsufficientStock(errors)
+
+    shrunk = [product_id for product_id, quantity in wanted.items() if quantity < live.get(product_id, 0)]
+    if shrunk:
+        cache.delete_many([_held_key(product_id) for product_id in shrunk])
+
+
+def commit(cart, quantities):
+    """
+    Take ``quantities`` ({product_id: quantity}) out of stock for the
+    checkout of ``cart``, leaving the units held by other carts.
+
+    Raises ``store.inventory.OutOfStock``; call it inside the checkout
+    transaction and clear the cart afterwards to drop its holds.
+    """
+    inventory.decrement(quantities, floor=held(exclude_cart=cart))
+    transaction.on_commit(lambda: cache.delete_many([_held_key(product_id) for product_id in quantities]))
@@ -0,0 +1,50 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch import receiver
+
+from store.models import Product
+from store.signals import product_prices_changed
+from .models import Cart, CartItem
+from .storage import SESSION_CART_KEY
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """Hand the anonymous cart to the user, merging it into their own cart if they have one"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    cart_id = request.session.pop(SESSION_CART_KEY, None)
+    if cart_id is None:
+        # Carts created before the id was kept in the session are found by
+        # the session key, which login() has already cycled; use the old one
+        session_key = getattr(request, 'arrival_session_key', None)
+        if not session_key:
+            return
+        cart_id = Cart.objects.filter(session_key=session_key, user=None).values_list('pk', flat=True).first()
+        if cart_id is None:
+            return
+    user_cart = Cart.objects.filter(user=user).order_by('pk').first()
+    if user_cart is None:
+        Cart.objects.filter(pk=cart_id, user=None).update(user=user, session_key=None)
+    elif Cart.objects.filter(pk=cart_id, user=None).exists():
+        user_cart.absorb(cart_id)
+
+
+@receiver(product_prices_changed)
+def reprice_carts(sender, product_ids, **kwargs):
+    """Recompute the cached totals of carts holding repriced products"""
+    Cart.objects.filter(items__product_id__in=product_ids).recalculate()
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance, **kwargs):
+    """Note which carts hold a product before the delete cascades to their items"""
+    instance._cart_ids = list(CartItem.objects.filter(product=instance).values_list('cart_id', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def product_removed_from_carts(sender, instance, **kwargs):
+    """The cascade dropped this product's cart items; refresh those carts' totals"""
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(pk__in=cart_ids).recalculate()
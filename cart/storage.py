@@ -0,0 +1,109 @@
+"""
+Pluggable cart storage.
+
+Views never look carts up directly; they ask ``get_cart_storage(request)``
+for the backend that fits the visitor and call ``get()`` to read (which
+never writes anything) or ``get_or_create()`` when an item is about to be
+added.  The backends are configurable with ``CART_USER_STORAGE`` and
+``CART_ANONYMOUS_STORAGE`` (dotted paths).
+
+``DatabaseCartStorage`` keeps the cart of an authenticated user in the
+database.  ``SessionCartStorage`` is for anonymous visitors: it only keeps
+the id of their cart in the session, and neither the session nor the Cart
+row exists until the first add-to-cart, so crawlers and one-page visitors
+that only render the cart badge cause no writes at all.  It works with any
+SESSION_ENGINE, including signed cookies.  On login the anonymous cart is
+handed to the user; see ``cart.signals``.
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Cart
+
+
+SESSION_CART_KEY = 'cart_id'
+
+DEFAULT_USER_STORAGE = 'cart.storage.DatabaseCartStorage'
+DEFAULT_ANONYMOUS_STORAGE = 'cart.storage.SessionCartStorage'
+
+
+class BaseCartStorage:
+    """Finds (and, when asked, creates) the cart of one request's visitor"""
+
+    def __init__(self, request):
+        self.request = request
+
+    def _cache(self):
+        # The view and the cart badge context processor share one lookup
+        if not hasattr(self.request, '_cart_cache'):
+            self.request._cart_cache = {}
+        return self.request._cart_cache, (type(self), self.request.user.pk)
+
+    def get(self):
+        """Return the visitor's cart, or None; never writes anything"""
+        cache, key = self._cache()
+        if key not in cache:
+            cache[key] = self.load()
+        return cache[key]
+
+    def get_or_create(self):
+        """Return the visitor's cart, creating it if needed"""
+        cart = self.get()
+        if cart is None:
+            cart = self.create()
+            cache, key = self._cache()
+            cache[key] = cart
+        return cart
+
+    def load(self):
+        """Look the visitor's cart up; None if there is none"""
+        raise NotImplementedError
+
+    def create(self):
+        """Create a cart for the visitor"""
+        raise NotImplementedError
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """Carts of authenticated users, keyed by user"""
+
+    def load(self):
+        return Cart.objects.filter(user=self.request.user).order_by('pk').first()
+
+    def create(self):
+        return Cart.objects.create(user=self.request.user)
+
+
+class SessionCartStorage(BaseCartStorage):
+    """Anonymous carts, found through a cart id kept in the session"""
+
+    def load(self):
+        session = self.request.session
+        cart_id = session.get(SESSION_CART_KEY)
+        if cart_id is not None:
+            return Cart.objects.filter(pk=cart_id, user=None).first()
+        if session.session_key:
+            # Carts created before the id was kept in the session
+            return Cart.objects.filter(session_key=session.session_key, user=None).first()
+        return None
+
+    def get_or_create(self):
+        cart = super().get_or_create()
+        if self.request.session.get(SESSION_CART_KEY) != cart.pk:
+            self.request.session[SESSION_CART_KEY] = cart.pk
+        return cart
+
+    def create(self):
+        session = self.request.session
+        if not session.session_key:
+            session.create()
+        return Cart.objects.create(session_key=session.session_key)
+
+
+def get_cart_storage(request):
+    """Return the configured cart storage for this request's visitor"""
+    if request.user.is_authenticated:
+        path = getattr(settings, 'CART_USER_STORAGE', DEFAULT_USER_STORAGE)
+    else:
+        path = getattr(settings, 'CART_ANONYMOUS_STORAGE', DEFAULT_ANONYMOUS_STORAGE)
+    return import_string(path)(request)
@@ -9,5 +9,6 @@ urlpatterns = [
     path('remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('update/<int:item_id>/', views.update_quantity, name='update_quantity'),
     path('count/', views.get_cart_count, name='get_cart_count'),
+    path('batch/', views.batch_update, name='batch_update'),
 ]
 
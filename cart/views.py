@@ -1,26 +1,56 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from orders import pricing
+from pykart.querycount import query_budget
+from .batch import CartBatchError, apply_batch
 from .models import Cart, CartItem
+from .reservations import InsufficientStock, hold
+from .storage import get_cart_storage
 from store.models import Product
 
 
+def get_cart(request):
+    """Get the visitor's cart without creating one; None if there is none yet"""
+    return get_cart_storage(request).get()
+
+
 def get_or_create_cart(request):
     """Get or create cart for user (authenticated or anonymous)"""
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-    else:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
+    return get_cart_storage(request).get_or_create()
+
+
+def remember_cart_count(response, cart):
+    """Mirror the badge count into a cookie that main.js can read"""
+    response.set_cookie(
+        getattr(settings, 'CART_COUNT_COOKIE', 'cart_count'),
+        str(cart.item_count if cart else 0),
+        samesite='Lax',
+    )
+    return response
+
+
+def prefetch_cart_items(cart):
+    """Load a cart's items with their products and categories in one query"""
+    prefetch_related_objects(
+        [cart], Prefetch('items', queryset=CartItem.objects.select_related('product__category'))
+    )
     return cart
 
 
+@query_budget(6)
 def view_cart(request):
     """Display shopping cart"""
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
+    if cart is None:
+        return render(request, 'cart/cart.html', {'cart': None, 'cart_items': [], 'cart_total': 0, 'item_count': 0})
+    prefetch_cart_items(cart)
     cart_items = cart.items.all()
     
     context = {
@@ -28,11 +58,15 @@ def view_cart(request):
         'cart_items': cart_items,
         'cart_total': cart.get_total(),
         'item_count': cart.get_item_count(),
+        # Estimated without a destination; checkout reprices for the address
+        'quote': pricing.quote(cart, cart_items),
     }
     return render(request, 'cart/cart.html', context)
 
 
+# A visitor's first add, which also creates the session and the cart, runs 17
 @require_POST
+@query_budget(20)
 def add_to_cart(request, product_id):
     """Add product to cart"""
     try:
@@ -50,33 +84,32 @@ def add_to_cart(request, product_id):
         
         cart = get_or_create_cart(request)
         
-        # Get or create cart item
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
+        cart_item = cart.items.filter(product=product).first()
+        new_quantity = quantity if cart_item is None else cart_item.quantity + quantity
+        if new_quantity > product.stock:
+            messages.error(request, f'Cannot add more. Only {product.stock} items available in stock.')
+            return redirect('store:product_detail', slug=product.slug)
         
-        if not created:
-            # Update quantity if item already exists
-            new_quantity = cart_item.quantity + quantity
-            if new_quantity > product.stock:
-                messages.error(request, f'Cannot add more. Only {product.stock} items available in stock.')
-                return redirect('store:product_detail', slug=product.slug)
-            cart_item.quantity = new_quantity
-            cart_item.save()
+        # Hold the units for this cart while it is being filled
+        try:
+            with transaction.atomic():
+                hold(cart, {product: new_quantity})
+                cart.add_item(product, quantity, item=cart_item)
+        except InsufficientStock as exc:
+            messages.error(request, exc.errors[0])
+            return redirect('store:product_detail', slug=product.slug)
         
         messages.success(request, f'{product.name} added to cart!')
         
         # Return JSON for AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({
+            return remember_cart_count(JsonResponse({
                 'success': True,
                 'message': f'{product.name} added to cart!',
                 'cart_count': cart.get_item_count(),
-            })
+            }), cart)
         
-        return redirect('cart:view_cart')
+        return remember_cart_count(redirect('cart:view_cart'), cart)
     
     except ValueError:
         messages.error(request, 'Invalid quantity.')
@@ -87,33 +120,34 @@ def add_to_cart(request, product_id):
 
 
 @require_POST
+@query_budget(12)
 def remove_from_cart(request, item_id):
     """Remove item from cart"""
-    cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    cart = get_cart(request)
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart=cart)
     product_name = cart_item.product.name
-    cart_item.delete()
+    cart.remove_item(cart_item)
     
     messages.success(request, f'{product_name} removed from cart.')
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        cart = get_or_create_cart(request)
-        return JsonResponse({
+        return remember_cart_count(JsonResponse({
             'success': True,
             'message': f'{product_name} removed from cart.',
             'cart_count': cart.get_item_count(),
             'cart_total': float(cart.get_total()),
-        })
+        }), cart)
     
-    return redirect('cart:view_cart')
+    return remember_cart_count(redirect('cart:view_cart'), cart)
 
 
 @require_POST
+@query_budget(12)
 def update_quantity(request, item_id):
     """Update quantity of cart item"""
     try:
-        cart = get_or_create_cart(request)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        cart = get_cart(request)
+        cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart=cart)
         quantity = int(request.POST.get('quantity', 1))
         
         # Validate quantity
@@ -125,22 +159,26 @@ def update_quantity(request, item_id):
             messages.error(request, f'Only {cart_item.product.stock} items available in stock.')
             return redirect('cart:view_cart')
         
-        cart_item.quantity = quantity
-        cart_item.save()
+        try:
+            with transaction.atomic():
+                hold(cart, {cart_item.product: quantity})
+                cart.set_quantity(cart_item, quantity)
+        except InsufficientStock as exc:
+            messages.error(request, exc.errors[0])
+            return redirect('cart:view_cart')
         
         messages.success(request, 'Cart updated.')
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            cart = get_or_create_cart(request)
-            return JsonResponse({
+            return remember_cart_count(JsonResponse({
                 'success': True,
                 'message': 'Cart updated.',
                 'cart_count': cart.get_item_count(),
                 'cart_total': float(cart.get_total()),
                 'item_subtotal': float(cart_item.get_subtotal()),
-            })
+            }), cart)
         
-        return redirect('cart:view_cart')
+        return remember_cart_count(redirect('cart:view_cart'), cart)
     
     except ValueError:
         messages.error(request, 'Invalid quantity.')
@@ -150,8 +188,63 @@ def update_quantity(request, item_id):
         return redirect('cart:view_cart')
 
 
+def _quote_json(cart):
+    quote = pricing.quote(cart)
+    return {'tax': float(quote.tax), 'shipping_cost': float(quote.shipping_cost), 'order_total': float(quote.total)}
+
+
+@require_POST
+@query_budget(16)
+def batch_update(request):
+    """
+    Apply a JSON list of add/update/remove operations in one transaction.
+
+    Expects ``{"operations": [...]}`` (see cart.batch) and answers with the
+    touched items and the new cart summary, or 400 and the reasons if the
+    batch was rejected as a whole.
+    """
+    try:
+        payload = json.loads(request.body)
+        operations = payload['operations']
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'errors': ['Expected {"operations": [...]}.']}, status=400)
+
+    adds = isinstance(operations, list) and any(isinstance(op, dict) and op.get('op') == 'add' for op in operations)
+    cart = get_or_create_cart(request) if adds else get_cart(request)
+    if cart is None:
+        return JsonResponse({'success': False, 'errors': ['Your cart is empty.']}, status=400)
+
+    try:
+        touched = apply_batch(cart, operations)
+    except CartBatchError as exc:
+        return JsonResponse({'success': False, 'errors': exc.errors}, status=400)
+
+    return remember_cart_count(JsonResponse({
+        'success': True,
+        'cart_count': cart.item_count,
+        'cart_total': float(cart.total),
+        **_quote_json(cart),
+        'version': cart.version,
+        'items': [
+            {
+                'product_id': product_id,
+                'item_id': item.pk if item else None,
+                'quantity': item.quantity if item else 0,
+                'item_subtotal': float(item.get_subtotal()) if item else 0,
+            }
+            for product_id, item in touched.items()
+        ],
+    }), cart)
+
+
+@query_budget(4)
 def get_cart_count(request):
-    """Get cart item count for AJAX requests"""
-    cart = get_or_create_cart(request)
-    return JsonResponse({'count': cart.get_item_count()})
+    """
+    Get cart item count for AJAX requests.
+
+    Pages render the count server-side (see cart.context_processors), so
+    this is only a fallback for scripts without a rendered badge.
+    """
+    cart = get_cart(request)
+    return remember_cart_count(JsonResponse({'count': cart.get_item_count() if cart else 0}), cart)
 
@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once no jobs are due')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs leased per claim')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when idle')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+        parser.add_argument('--name', help='Worker name recorded on leased jobs (default host:pid)')
+
+    def handle(self, *args, **options):
+        worker = Worker(name=options['name'], batch_size=options['batch_size'])
+
+        def stop(signum, frame):
+            # Finish the running job, then exit
+            worker.stopping = True
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(f'Worker {worker.name} started.')
+        succeeded, failed = worker.work(
+            burst=options['burst'], poll_interval=options['poll_interval'], max_jobs=options['max_jobs'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.name} stopped: {succeeded} jobs done, {failed} failed.'))
@@ -0,0 +1,236 @@
+"""
+A small durable job queue in the database.
+
+``enqueue('orders.tasks.send_order_confirmation', order_id=...)`` writes a
+Job row in the caller's transaction, so the job is committed together with
+the rows that caused it and disappears if they are rolled back; nothing is
+lost between "order saved" and "email queued".  No broker is needed, so it
+runs as-is on SQLite.
+
+Work that queues several jobs at once (checkout queues four) runs inside
+``batched()``, which collects them and writes them with one INSERT.
+
+``enqueue_once`` debounces: it reuses a job for the same task and payload
+that is still queued, for work such as rebuilds that one run covers.
+
+``manage.py run_worker`` runs a ``Worker``, which
+
+* claims up to ``batch_size`` due jobs with one conditional UPDATE that
+  also takes a lease (``locked_by``/``locked_until``), so concurrent
+  workers never claim the same job;
+* calls each job's task with its payload inside a transaction;
+* on failure requeues the job with exponential backoff and jitter, until
+  ``max_attempts`` is reached and the job is marked dead (the dead-letter
+  state, retried from the admin);
+* retries jobs whose lease expired, e.g. because their worker died.
+
+Delivery is at least once, so tasks must be idempotent.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE = timedelta(minutes=5)
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_BASE = timedelta(seconds=10)
+DEFAULT_BACKOFF_MAX = timedelta(hours=1)
+DEFAULT_KEEP_DONE = timedelta(days=7)
+
+# The jobs collected by the innermost ``batched`` block of this thread
+_batch = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _task_path(task):
+    return f'{task.__module__}.{task.__qualname__}' if callable(task) else task
+
+
+def job(task, delay=None, max_attempts=None, **payload):
+    """An unsaved Job calling ``task`` with ``payload``; see ``enqueue``"""
+    return Job(
+        task=_task_path(task),
+        payload=payload,
+        max_attempts=max_attempts or _setting('JOBS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        run_at=timezone.now() + (delay or timedelta(0)),
+    )
+
+
+def enqueue_many(jobs):
+    """Write unsaved ``jobs`` with one INSERT; returns them"""
+    return Job.objects.bulk_create(jobs) if jobs else []
+
+
+def _collecting():
+    return getattr(_batch, 'jobs', None)
+
+
+@contextmanager
+def batched():
+    """
+    Collect the jobs queued inside the block, from any caller (including
+    signal receivers), and write them with one ``enqueue_many`` when it
+    ends.  Nothing is written if the block raises.  Blocks nest; the
+    outermost one writes.
+    """
+    if _collecting() is not None:
+        yield
+        return
+    _batch.jobs = []
+    try:
+        yield
+        jobs, _batch.jobs = _batch.jobs, None
+        enqueue_many(jobs)
+    finally:
+        _batch.jobs = None
+
+
+def enqueue(task, delay=None, max_attempts=None, **payload):
+    """
+    Queue ``task`` (a dotted path, or a module-level function) to be called
+    with ``payload`` as keyword arguments; the payload must be JSON
+    serializable.  Returns the Job, which is not saved yet inside
+    ``batched``.
+    """
+    new = job(task, delay=delay, max_attempts=max_attempts, **payload)
+    collecting = _collecting()
+    if collecting is not None:
+        collecting.append(new)
+        return new
+    new.save()
+    return new
+
+
+def enqueue_once(task, delay=None, max_attempts=None, **payload):
+    """
+    Like ``enqueue``, but return the job already queued for ``task`` with
+    the same payload if there is one, so a burst of triggers within
+    ``delay`` runs the task once.  A job that is already running does not
+    count: it may have started before the trigger.
+    """
+    task = _task_path(task)
+    for pending in _collecting() or []:
+        if pending.task == task and pending.payload == payload:
+            return pending
+    queued = Job.objects.filter(task=task, payload=payload, status=Job.QUEUED).first()
+    return queued or enqueue(task, delay=delay, max_attempts=max_attempts, **payload)
+
+
+def backoff(attempts):
+    """Delay before retrying a job that failed ``attempts`` times"""
+    base = _setting('JOBS_BACKOFF_BASE', DEFAULT_BACKOFF_BASE)
+    delay = min(base * 2 ** (attempts - 1), _setting('JOBS_BACKOFF_MAX', DEFAULT_BACKOFF_MAX))
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def purge_finished(older_than=None):
+    """Delete jobs that finished successfully more than ``older_than`` ago"""
+    cutoff = timezone.now() - (older_than or _setting('JOBS_KEEP_DONE', DEFAULT_KEEP_DONE))
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+class Worker:
+    """Claims due jobs, runs them and records the outcome"""
+
+    def __init__(self, name=None, batch_size=10, lease=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.batch_size = batch_size
+        self.lease = lease or _setting('JOBS_LEASE', DEFAULT_LEASE)
+        self.stopping = False
+
+    def claim(self, limit=None):
+        """Lease up to ``batch_size`` (or ``limit``) due jobs to this worker"""
+        now = timezone.now()
+        due = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+        count = min(self.batch_size, limit) if limit is not None else self.batch_size
+        ids = list(Job.objects.filter(due).order_by('run_at', 'id').values_list('pk', flat=True)[:count])
+        if not ids:
+            return []
+        locked_until = now + self.lease
+        # Re-checking ``due`` makes the claim conditional: a job another
+        # worker claimed in the meantime no longer matches.
+        Job.objects.filter(due, pk__in=ids).update(
+            status=Job.RUNNING, locked_by=self.name, locked_until=locked_until, attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(pk__in=ids, locked_by=self.name, locked_until=locked_until))
+
+    def release(self, jobs):
+        """Hand claimed jobs that will not be run back to the queue"""
+        Job.objects.filter(pk__in=[job.pk for job in jobs], locked_by=self.name, status=Job.RUNNING).update(
+            status=Job.QUEUED, locked_until=None, attempts=F('attempts') - 1,
+        )
+
+    def run(self, job):
+        """Run one claimed job; returns True if it succeeded"""
+        mine = Job.objects.filter(pk=job.pk, locked_by=self.name, locked_until=job.locked_until)
+        if job.attempts > job.max_attempts:
+            # Its lease kept expiring: the job probably kills its worker
+            mine.update(status=Job.DEAD, finished_at=timezone.now(), last_error='Lease expired on every attempt')
+            return False
+        try:
+            with transaction.atomic():
+                import_string(job.task)(**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            logger.warning('Job %s (%s) failed on attempt %d', job.pk, job.task, job.attempts)
+            if job.attempts >= job.max_attempts:
+                mine.update(status=Job.DEAD, finished_at=timezone.now(), locked_until=None, last_error=error)
+            else:
+                mine.update(
+                    status=Job.QUEUED, run_at=timezone.now() + backoff(job.attempts),
+                    locked_until=None, last_error=error,
+                )
+            return False
+        mine.update(status=Job.DONE, finished_at=timezone.now(), locked_until=None, last_error='')
+        return True
+
+    def work(self, burst=False, poll_interval=1.0, max_jobs=None):
+        """
+        Run jobs until stopped (or, with ``burst``, until none are due).
+        Returns the counts of succeeded and failed jobs.
+        """
+        succeeded = failed = 0
+        last_purge = 0
+        while not self.stopping and (max_jobs is None or succeeded + failed < max_jobs):
+            close_old_connections()
+            limit = None if max_jobs is None else max_jobs - succeeded - failed
+            jobs = self.claim(limit)
+            if not jobs:
+                if time.monotonic() - last_purge > 3600:
+                    purge_finished()
+                    last_purge = time.monotonic()
+                if burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+            for index, job in enumerate(jobs):
+                if self.stopping:
+                    self.release(jobs[index:])
+                    break
+                if self.run(job):
+                    succeeded += 1
+                else:
+                    failed += 1
+        close_old_connections()
+        return succeeded, failed
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .invoices import zip_stream
 from .models import Order, OrderItem
 
 
@@ -16,6 +19,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'user__username', 'user__email', 'shipping_name']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
     inlines = [OrderItemInline]
+    actions = ['download_invoices']
     
     fieldsets = (
         ('Order Information', {
@@ -34,6 +38,13 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Download PDF invoices of selected orders (ZIP)')
+    def download_invoices(self, request, queryset):
+        # Streamed, so any number of orders can be selected
+        response = StreamingHttpResponse(zip_stream(queryset.order_by('pk')), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="invoices-{timezone.now():%Y%m%d-%H%M%S}.zip"'
+        return response
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
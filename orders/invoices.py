@@ -0,0 +1,177 @@
+"""
+Pre-rendered invoices.
+
+An order's line items never change after checkout (OrderItem keeps
+``product_name`` and ``product_price`` snapshots); only its status and
+payment status do.  So the invoice is rendered once, to HTML with the
+``orders/invoice.html`` template and to PDF with the pure-Python writer in
+``orders.pdf``, when the order is created or one of those statuses changes
+(a job queued by ``orders.signals``).  The files are stored under
+``invoices/`` in the default storage, named after a hash of their content,
+so a stored file never changes; the hashes double as strong ETags.
+
+``current_invoice`` returns the stored invoice, rendering it on the spot
+if the job has not run yet, and ``zip_stream`` streams the PDFs of many
+orders as one ZIP archive without holding it in memory.
+"""
+import hashlib
+import zipfile
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .models import Invoice
+from .pdf import Document
+
+
+def state_of(order):
+    """The parts of an order the invoice shows that can change after checkout"""
+    return f'{order.status}/{order.payment_status}'
+
+
+def _money(amount):
+    return f'Rs. {amount:,.2f}'
+
+
+def render_pdf(order, items):
+    """The invoice as PDF bytes"""
+    document = Document()
+    left, right = 50, document.width - 50
+    y = document.height - 60
+
+    def advance(step):
+        nonlocal y
+        y -= step
+        if y < 60:
+            document.new_page()
+            y = document.height - 60
+
+    document.text(left, y, 'INVOICE', size=22, font='bold')
+    document.text_right(right, y, f'Invoice #: {order.order_number}', size=9)
+    advance(16)
+    document.text(left, y, 'PyKart E-Commerce', size=11, font='bold')
+    document.text_right(right, y, f'Date: {order.created_at:%B %d, %Y}', size=9)
+    advance(14)
+    document.text_right(right, y, f'Order Status: {order.get_status_display()}', size=9)
+    advance(10)
+    document.line(left, y, right, y, width=1.5)
+    advance(24)
+
+    document.text(left, y, 'Bill To:', size=12, font='bold')
+    advance(16)
+    address = [order.shipping_name, order.shipping_address_line1, order.shipping_address_line2,
+               f'{order.shipping_city}, {order.shipping_state} {order.shipping_postal_code}',
+               order.shipping_country, f'Phone: {order.shipping_phone}']
+    for line in filter(None, address):
+        document.text(left, y, line)
+        advance(14)
+    advance(12)
+
+    columns = (right - 230, right - 120, right)
+    document.text(left, y, 'Product', font='bold')
+    for x, heading in zip(columns, ('Price', 'Qty', 'Subtotal')):
+        document.text(x - len(heading) * 6, y, heading, font='bold')
+    advance(6)
+    document.line(left, y, right, y)
+    advance(16)
+    for item in items:
+        document.text(left, y, item.product_name[:60])
+        document.text_right(columns[0], y, _money(item.product_price))
+        document.text_right(columns[1], y, str(item.quantity))
+        document.text_right(columns[2], y, _money(item.subtotal))
+        advance(16)
+    document.line(left, y + 10, right, y + 10)
+    advance(8)
+
+    for label, amount in (('Subtotal', order.subtotal), ('Tax', order.tax),
+                          ('Shipping', order.shipping_cost), ('Total', order.total)):
+        font, size = ('bold', 12) if label == 'Total' else ('regular', 10)
+        document.text(right - 230, y, f'{label}:', size=size, font=font)
+        document.text_right(right, y, _money(amount), size=size)
+        advance(18)
+    advance(20)
+
+    document.text(left, y, f'Payment Status: {order.get_payment_status_display()}')
+    advance(14)
+    document.text(left, y, f'Payment Method: {order.payment_method}')
+    advance(28)
+    document.text(left, y, 'Thank you for your business!', size=9)
+    return document.render()
+
+
+def render(order):
+    """Render and store the invoice of ``order``; files whose content did not change are kept"""
+    items = list(order.items.all())
+    contents = {
+        'html': render_to_string('orders/invoice.html', {'order': order, 'items': items}).encode(),
+        'pdf': render_pdf(order, items),
+    }
+    replaced = []
+    with transaction.atomic():
+        invoice, _ = Invoice.objects.select_for_update().get_or_create(order=order)
+        for kind, content in contents.items():
+            digest = hashlib.sha256(content).hexdigest()
+            if getattr(invoice, f'{kind}_digest') == digest:
+                continue
+            field = getattr(invoice, kind)
+            if field:
+                replaced.append(field.name)
+            field.save(f'{order.order_number}-{digest[:16]}.{kind}', ContentFile(content), save=False)
+            setattr(invoice, f'{kind}_digest', digest)
+        invoice.rendered_state = state_of(order)
+        invoice.save()
+        # Old versions go once nothing can roll back to them
+        transaction.on_commit(lambda: [default_storage.delete(name) for name in replaced])
+    order.invoice = invoice
+    return invoice
+
+
+def current_invoice(order):
+    """The stored invoice matching the order's current state, rendering it if needed"""
+    try:
+        invoice = order.invoice
+    except ObjectDoesNotExist:
+        invoice = None
+    if invoice is None or invoice.rendered_state != state_of(order) or not invoice.pdf:
+        invoice = render(order)
+    return invoice
+
+
+class _Pipe:
+    """Write-only file that collects what ZipFile writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_stream(orders, chunk_size=64 * 1024):
+    """
+    Yield a ZIP archive of the PDF invoices of ``orders`` piece by piece,
+    e.g. as the body of a StreamingHttpResponse.  Only one chunk of one
+    file is in memory at a time.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for order in orders.select_related('invoice').iterator(chunk_size=200):
+            invoice = current_invoice(order)
+            with archive.open(f'{order.order_number}.pdf', 'w') as target, invoice.pdf.open('rb') as source:
+                for chunk in source.chunks(chunk_size):
+                    target.write(chunk)
+                    yield pipe.drain()
+            yield pipe.drain()
+    yield pipe.drain()
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" product neighbours from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.DEFAULT_TOP_K)
+        parser.add_argument('--shard-size', type=int, default=recommendations.DEFAULT_SHARD_SIZE,
+                            help='Anchor products held in memory per pass over the order items')
+        parser.add_argument('--chunk-size', type=int, default=recommendations.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--max-orders', type=int, default=None,
+                            help='Only read the most recent orders (default: RECOMMENDATIONS_MAX_ORDERS; 0 for all)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        products, written = recommendations.rebuild_neighbors(
+            top_k=options['top_k'],
+            shard_size=options['shard_size'],
+            chunk_size=options['chunk_size'],
+            max_orders=options['max_orders'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {written} neighbours for {products} products in {elapsed:.1f}s.'
+        ))
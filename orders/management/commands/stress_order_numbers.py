@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from orders.models import OrderNumberSequence
+from orders.numbers import BlockAllocator, encode
+
+
+SEQUENCE_NAME = 'stress-test'
+
+
+def _worker_setup():
+    # Forked workers must not share the parent's database connection
+    django.setup()
+    connections.close_all()
+
+
+def _allocate(block_size, count):
+    allocator = BlockAllocator(SEQUENCE_NAME, block_size=block_size)
+    try:
+        return [allocator.next() for _ in range(count)]
+    finally:
+        close_old_connections()
+
+
+def _run_process(threads, block_size, count):
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(_allocate, [block_size] * threads, [count] * threads))
+    return [value for values in results for value in values]
+
+
+class Command(BaseCommand):
+    help = 'Allocate order numbers from many concurrent processes and threads and check none repeat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=4, help='Allocators per process, one per thread')
+        parser.add_argument('--count', type=int, default=500, help='Numbers drawn by each allocator')
+        parser.add_argument('--block-size', type=int, default=10,
+                            help='Small blocks make the allocators contend on the sequence row')
+
+    def handle(self, *args, **options):
+        processes, threads = options['processes'], options['threads']
+        OrderNumberSequence.objects.filter(name=SEQUENCE_NAME).delete()
+        connections.close_all()
+
+        started = time.monotonic()
+        with ProcessPoolExecutor(processes, initializer=_worker_setup) as pool:
+            futures = [
+                pool.submit(_run_process, threads, options['block_size'], options['count'])
+                for _ in range(processes)
+            ]
+            values = [value for future in futures for value in future.result()]
+        elapsed = time.monotonic() - started
+
+        end = OrderNumberSequence.objects.get(name=SEQUENCE_NAME).next_value
+        OrderNumberSequence.objects.filter(name=SEQUENCE_NAME).delete()
+
+        duplicates = len(values) - len(set(values))
+        codes = len({encode(value) for value in values})
+        if duplicates or codes != len(values):
+            raise CommandError(f'{duplicates} duplicate values, {len(values) - codes} duplicate numbers')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(values)} unique order numbers from {processes * threads} allocators in {elapsed:.2f}s '
+            f'({len(values) / elapsed:.0f}/s), {end // options["block_size"]} blocks reserved.'
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('html', models.FileField(blank=True, upload_to='invoices/')),
+                ('html_digest', models.CharField(blank=True, max_length=64)),
+                ('pdf', models.FileField(blank=True, upload_to='invoices/')),
+                ('pdf_digest', models.CharField(blank=True, max_length=64)),
+                ('rendered_state', models.CharField(blank=True, max_length=50)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='orders.order')),
+            ],
+        ),
+    ]
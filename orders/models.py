@@ -52,9 +52,32 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history pages are keyset ranges over this index (orders.views.order_history)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_history_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number} - {self.user.username}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets post_save receivers tell what a save changed (see has_changed)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Every post_save receiver has compared against the old values by now
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def has_changed(self, *field_names):
+        """Whether any of the fields differs from the value last loaded or saved"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(loaded.get(name) != getattr(self, name) for name in field_names)
     
     def get_shipping_address(self):
         """Return formatted shipping address"""
@@ -81,3 +104,27 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product_name} in Order {self.order.order_number}"
 
+
+class Invoice(models.Model):
+    """Pre-rendered HTML and PDF invoice of an order (see orders.invoices)"""
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
+    # Files are named after their content hash and never change once written
+    html = models.FileField(upload_to='invoices/', blank=True)
+    html_digest = models.CharField(max_length=64, blank=True)
+    pdf = models.FileField(upload_to='invoices/', blank=True)
+    pdf_digest = models.CharField(max_length=64, blank=True)
+    # The order state the files were rendered from
+    rendered_state = models.CharField(max_length=50, blank=True)
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Invoice for {self.order_id} ({self.rendered_state})"
+
+
+class OrderNumberSequence(models.Model):
+    """A named counter that order numbers are allocated from in blocks (see orders.numbers)"""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -0,0 +1,142 @@
+"""
+Collision-free order numbers.
+
+Order numbers keep the ``ORD-YYYYMMDD-XXXXXX`` shape, but the six
+characters are no longer random: they encode a value drawn from a
+database sequence (``OrderNumberSequence``), so two orders can never get
+the same number, whichever process or server placed them.
+
+Each process reserves a block of ``ORDER_NUMBER_BLOCK_SIZE`` values with
+one ``UPDATE ... RETURNING`` round trip and hands them out from memory, so
+the sequence row is touched once per block rather than once per order.
+Values of a block that a process never used (e.g. on restart) are simply
+skipped.  Reservation runs in its own short transaction, so call it
+before, not inside, the checkout transaction.
+
+Sequence values are scrambled with a bijective affine map modulo 36**6
+before being written in base 36, so consecutive orders do not get
+consecutive, guessable numbers; the map is a bijection, so distinct
+values still give distinct numbers.  The space holds 36**6 (about 2.2
+billion) numbers.
+"""
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderNumberSequence
+
+
+ALPHABET = string.digits + string.ascii_uppercase
+WIDTH = 6
+SPACE = len(ALPHABET) ** WIDTH
+
+# MULTIPLIER must share no factor with SPACE (2**12 * 3**6)
+MULTIPLIER = 1402643437
+OFFSET = 914277119
+
+DEFAULT_BLOCK_SIZE = 50
+SEQUENCE_NAME = 'order_number'
+
+
+def encode(value):
+    """Scramble sequence ``value`` into six base-36 characters"""
+    if not 0 <= value < SPACE:
+        raise ValueError(f'Order number sequence exhausted at {value}')
+    value = (value * MULTIPLIER + OFFSET) % SPACE
+    chars = []
+    for _ in range(WIDTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    """The sequence value behind six base-36 characters (inverse of ``encode``)"""
+    value = 0
+    for char in code:
+        value = value * len(ALPHABET) + ALPHABET.index(char)
+    return (value - OFFSET) * pow(MULTIPLIER, -1, SPACE) % SPACE
+
+
+def _supports_update_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+class BlockAllocator:
+    """Hands out sequence values from blocks reserved in the database"""
+
+    def __init__(self, name=SEQUENCE_NAME, block_size=None, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.block_size = block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+        self.using = using
+        self._next = self._end = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def reserve_block(self):
+        """Reserve ``block_size`` values; returns the (start, end) range"""
+        end = self._advance()
+        if end is None:
+            # First use: create the row, losing the race to another process is fine
+            OrderNumberSequence.objects.using(self.using).get_or_create(name=self.name)
+            end = self._advance()
+        return end - self.block_size, end
+
+    def _advance(self):
+        connection = connections[self.using]
+        if _supports_update_returning(connection):
+            table = connection.ops.quote_name(OrderNumberSequence._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET next_value = next_value + %s WHERE name = %s RETURNING next_value',
+                    [self.block_size, self.name],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+        with transaction.atomic(using=self.using):
+            sequences = OrderNumberSequence.objects.using(self.using).filter(name=self.name)
+            if not sequences.update(next_value=F('next_value') + self.block_size):
+                return None
+            return sequences.values_list('next_value', flat=True).get()
+
+    def next(self):
+        """The next value, reserving a new block when this one is used up"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child must not hand out its parent's block
+                self._next = self._end = 0
+                self._pid = os.getpid()
+            if self._next >= self._end:
+                self._next, self._end = self.reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def _get_allocator():
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = BlockAllocator()
+        return _allocator
+
+
+def format_order_number(value, date=None):
+    """``ORD-YYYYMMDD-XXXXXX`` for sequence ``value``"""
+    return f"ORD-{(date or timezone.localdate()):%Y%m%d}-{encode(value)}"
+
+
+def next_order_number():
+    """A new, never before issued order number"""
+    return format_order_number(_get_allocator().next())
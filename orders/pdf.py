@@ -0,0 +1,96 @@
+"""
+A minimal PDF writer for plain text documents such as invoices.
+
+Only what the invoices need: pages of text in the standard Helvetica and
+Courier fonts (which every PDF viewer provides, so nothing is embedded)
+and straight lines.  Text is WinAnsi (cp1252) encoded; characters outside
+it are replaced.  The output depends only on what was drawn, so rendering
+the same document twice gives byte-identical files.
+"""
+import zlib
+
+
+A4 = (595, 842)
+
+FONTS = {
+    'regular': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+    'mono': 'Courier',
+}
+
+
+def _escape(text):
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def mono_width(text, size):
+    """Width of ``text`` in Courier, whose glyphs are all 0.6em wide"""
+    return len(text) * size * 0.6
+
+
+class Document:
+    """Collects drawing operations page by page and serializes them to PDF"""
+
+    def __init__(self, page_size=A4):
+        self.width, self.height = page_size
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+
+    def text(self, x, y, text, size=10, font='regular'):
+        """Draw ``text`` with its baseline starting at (x, y), measured from the bottom left"""
+        self.pages[-1].append(
+            b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (font.encode(), size, x, y, _escape(text))
+        )
+
+    def text_right(self, x, y, text, size=10):
+        """Draw ``text`` in Courier so that it ends at x"""
+        self.text(x - mono_width(text, size), y, text, size=size, font='mono')
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.pages[-1].append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def render(self):
+        """The document as PDF bytes"""
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        fonts = {
+            name: add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base.encode())
+            for name, base in FONTS.items()
+        }
+        resources = b'<< /Font << %s >> >>' % b' '.join(
+            b'/%s %d 0 R' % (name.encode(), number) for name, number in fonts.items()
+        )
+        kids = []
+        for operations in self.pages:
+            stream = zlib.compress(b'\n'.join(operations))
+            content = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            kids.append(add(
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>'
+                % (pages, self.width, self.height, resources, content)
+            ))
+        objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages
+        objects[pages - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % kid for kid in kids), len(kids),
+        )
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog, xref)
+        return bytes(output)
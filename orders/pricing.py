@@ -0,0 +1,141 @@
+"""
+Pricing: tax and shipping for a cart.
+
+Tax and shipping are configured as data.  ``TAX_RULES`` and
+``SHIPPING_RULES`` (overridden by the PRICING_TAX_RULES and
+PRICING_SHIPPING_RULES settings) are lists of dicts that may be restricted
+to a category (by slug) and/or a shipping state, e.g.::
+
+    PRICING_TAX_RULES = [
+        {'rate': '0.10'},
+        {'category': 'books', 'rate': '0.05'},
+        {'state': 'Goa', 'rate': '0.12'},
+    ]
+
+``rules()`` compiles them once per process into a RuleSet: dicts keyed by
+(category, state), so finding the rate of a line takes at most four
+dictionary lookups, from the most to the least specific, however many
+rules there are.  Later rules override earlier ones with the same scope.
+
+``quote`` prices a cart into an immutable Quote.  Quotes are cached under
+the cart's version (bumped by every change to its items), the destination
+state and the rule set, so the cart page and the checkout GET and POST
+compute a given cart's totals once.  A quote remembers the prices it was
+computed from and is recomputed if any of them changed since.
+"""
+import functools
+import hashlib
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import slugify
+
+
+TAX_RULES = [
+    {'rate': '0.10'},  # 10% tax (mock)
+]
+SHIPPING_RULES = [
+    {'cost': '10.00', 'free_over': '100'},  # Free shipping over ₹100
+]
+
+QUOTE_TIMEOUT = 60 * 15
+
+CENT = Decimal('0.01')
+
+
+def _state(value):
+    return ' '.join(value.split()).casefold() if value else None
+
+
+class RuleSet:
+    """Tax and shipping rules compiled into lookup tables"""
+
+    def __init__(self, tax_rules, shipping_rules):
+        self.tax = {}
+        for rule in tax_rules:
+            self.tax[(rule.get('category'), _state(rule.get('state')))] = Decimal(rule['rate'])
+        self.shipping = {}
+        for rule in shipping_rules:
+            free_over = rule.get('free_over')
+            self.shipping[_state(rule.get('state'))] = (
+                Decimal(rule['cost']), Decimal(free_over) if free_over is not None else None,
+            )
+        # Part of every quote's cache key, so changing the rules reprices carts
+        self.version = hashlib.sha256(repr((sorted(self.tax.items(), key=repr),
+                                            sorted(self.shipping.items(), key=repr))).encode()).hexdigest()[:12]
+
+    def tax_rate(self, category, state):
+        for key in ((category, state), (category, None), (None, state), (None, None)):
+            if key in self.tax:
+                return self.tax[key]
+        return Decimal('0')
+
+    def shipping_cost(self, subtotal, state):
+        cost, free_over = self.shipping.get(state) or self.shipping.get(None) or (Decimal('0'), None)
+        if free_over is not None and subtotal >= free_over:
+            return Decimal('0.00')
+        return cost
+
+
+@functools.lru_cache(maxsize=None)
+def rules():
+    """The compiled rules from the settings; compiled once per process"""
+    return RuleSet(
+        getattr(settings, 'PRICING_TAX_RULES', TAX_RULES),
+        getattr(settings, 'PRICING_SHIPPING_RULES', SHIPPING_RULES),
+    )
+
+
+class Quote(namedtuple('Quote', ['subtotal', 'tax', 'shipping_cost', 'total', 'state', 'lines'])):
+    """The price of a cart; ``lines`` holds the (product id, quantity, price) it was computed from"""
+    __slots__ = ()
+
+    @property
+    def totals(self):
+        """The amounts as Order fields"""
+        return {'subtotal': self.subtotal, 'tax': self.tax, 'shipping_cost': self.shipping_cost, 'total': self.total}
+
+
+def _fingerprint(lines):
+    return tuple(sorted((line.product_id, line.quantity, line.product.price) for line in lines))
+
+
+def price(lines, state=None, ruleset=None):
+    """Quote ``lines`` (cart items with their products and categories) shipped to ``state``"""
+    ruleset = ruleset or rules()
+    state = _state(state)
+    subtotal = tax = Decimal('0')
+    for line in lines:
+        amount = line.get_subtotal()
+        subtotal += amount
+        tax += amount * ruleset.tax_rate(line.product.category.slug, state)
+    tax = tax.quantize(CENT, ROUND_HALF_UP)
+    shipping_cost = ruleset.shipping_cost(subtotal, state)
+    return Quote(subtotal, tax, shipping_cost, subtotal + tax + shipping_cost, state, _fingerprint(lines))
+
+
+def _key(cart, state, ruleset):
+    return f'quote:{ruleset.version}:{cart.pk}:{cart.version}:{slugify(state or "") or "-"}'
+
+
+def quote(cart, lines=None, state=None):
+    """
+    The Quote for ``cart`` shipped to ``state``, cached per cart version.
+
+    Pass the cart's loaded ``lines`` (items with ``product__category``)
+    wherever the quote is charged: the cached quote is then checked against
+    the current prices.  Without them a cached quote is returned as is, and
+    the lines are only loaded if there is none.
+    """
+    ruleset = rules()
+    key = _key(cart, _state(state), ruleset)
+    cached = cache.get(key)
+    if cached is not None and (lines is None or cached.lines == _fingerprint(lines)):
+        return cached
+    if lines is None:
+        lines = list(cart.items.select_related('product__category'))
+    result = price(lines, state, ruleset)
+    cache.set(key, result, getattr(settings, 'PRICING_QUOTE_TIMEOUT', QUOTE_TIMEOUT))
+    return result
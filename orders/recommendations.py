@@ -0,0 +1,146 @@
+"""
+Co-purchase recommendations.
+
+Builds a sparse product x product co-occurrence matrix from OrderItem (two
+products co-occur when they were bought in the same order) and stores the
+top-K neighbours of every product in ``store.ProductNeighbor``, so the
+product page reads its recommendations with one indexed lookup.
+
+Memory stays bounded on large order histories: order items are streamed in
+order_id order with ``.iterator()``, and the matrix is built one shard of
+anchor products at a time, so only ``shard_size`` rows of the matrix (plus
+one order count per product) are ever held in memory.  Scores are cosine
+similarities between the products' order vectors, which keeps best sellers
+from dominating every list.
+
+Each shard costs one pass over the order items, all in Python: no numpy
+or scipy is needed, at the price of about
+(products / shard_size) x order items dictionary updates per rebuild.  To
+keep that bounded as the history grows, only the most recent
+``max_orders`` orders (RECOMMENDATIONS_MAX_ORDERS) are read, which also
+lets the recommendations follow what customers buy now.
+
+The neighbours are rebuilt by ``manage.py build_recommendations`` and by
+the ``orders.tasks.refresh_recommendations`` job, which checkout queues at
+most once per RECOMMENDATIONS_REFRESH_DELAY however many orders come in.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from store.models import ProductNeighbor
+from .models import Order, OrderItem
+
+
+DEFAULT_TOP_K = 8
+DEFAULT_SHARD_SIZE = 20000
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_REFRESH_DELAY = timedelta(minutes=15)
+DEFAULT_MAX_ORDERS = 200000
+
+# Very large orders say little about which products belong together and
+# cost O(n^2) pairs, so only this many lines of an order are considered.
+MAX_BASKET_SIZE = 50
+
+
+def _history(max_orders):
+    """The order items of the ``max_orders`` most recent orders"""
+    items = OrderItem.objects.filter(product__isnull=False)
+    if max_orders:
+        oldest = list(Order.objects.order_by('-pk').values_list('pk', flat=True)[max_orders - 1:max_orders])
+        if oldest:
+            items = items.filter(order_id__gte=oldest[0])
+    return items
+
+
+def _baskets(history, chunk_size):
+    """Yield the set of product ids of every order, streaming order items"""
+    items = (
+        history
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    current_order = None
+    basket = set()
+    for order_id, product_id in items:
+        if order_id != current_order:
+            if len(basket) > 1:
+                yield basket
+            current_order = order_id
+            basket = set()
+        if len(basket) < MAX_BASKET_SIZE:
+            basket.add(product_id)
+    if len(basket) > 1:
+        yield basket
+
+
+def _order_counts(history):
+    """Number of orders containing each product"""
+    return dict(
+        history
+        .values('product_id')
+        .annotate(orders=Count('order_id', distinct=True))
+        .values_list('product_id', 'orders')
+    )
+
+
+def _build_shard(history, shard, order_counts, top_k, chunk_size):
+    """Return {product_id: [(score, neighbor_id), ...]} for the anchor products in ``shard``"""
+    co_counts = defaultdict(Counter)
+    for basket in _baskets(history, chunk_size):
+        for anchor in shard.intersection(basket):
+            row = co_counts[anchor]
+            for other in basket:
+                if other != anchor:
+                    row[other] += 1
+
+    neighbors = {}
+    for anchor, row in co_counts.items():
+        anchor_orders = order_counts.get(anchor, 1)
+        scored = (
+            (count / math.sqrt(anchor_orders * order_counts.get(other, 1)), other)
+            for other, count in row.items()
+        )
+        neighbors[anchor] = heapq.nlargest(top_k, scored)
+    return neighbors
+
+
+def rebuild_neighbors(top_k=DEFAULT_TOP_K, shard_size=DEFAULT_SHARD_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                      max_orders=None):
+    """
+    Recompute ProductNeighbor for every product bought in the last
+    ``max_orders`` orders (0 reads the whole history).
+
+    Returns (products, neighbours) written.
+    """
+    if max_orders is None:
+        max_orders = getattr(settings, 'RECOMMENDATIONS_MAX_ORDERS', DEFAULT_MAX_ORDERS)
+    history = _history(max_orders)
+    order_counts = _order_counts(history)
+    product_ids = sorted(order_counts)
+    ProductNeighbor.objects.exclude(product_id__in=history.values('product_id')).delete()
+
+    products = written = 0
+    for start in range(0, len(product_ids), shard_size):
+        shard_ids = product_ids[start:start + shard_size]
+        neighbors = _build_shard(history, set(shard_ids), order_counts, top_k, chunk_size)
+        rows = [
+            ProductNeighbor(product_id=anchor, neighbor_id=other, score=score, rank=rank)
+            for anchor, scored in neighbors.items()
+            for rank, (score, other) in enumerate(scored, start=1)
+        ]
+        # Swap each shard in its own transaction so readers never see it half written
+        with transaction.atomic():
+            ProductNeighbor.objects.filter(
+                product_id__gte=shard_ids[0], product_id__lte=shard_ids[-1]
+            ).delete()
+            ProductNeighbor.objects.bulk_create(rows, batch_size=1000)
+        products += len(neighbors)
+        written += len(rows)
+    return products, written
@@ -0,0 +1,86 @@
+"""
+Checkout.
+
+``place_order`` turns a cart into an order in one transaction with a
+fixed number of statements however many lines the cart has: the lines
+are read once with their products, the order items are written with one
+``bulk_create``, and the stock of every product is taken with a single
+guarded UPDATE (``store.inventory.decrement``) that also respects the
+units other carts hold (``cart.reservations``).  If any product runs
+short, ``OutOfStock`` propagates and nothing is written.
+
+Everything that can happen after the order is committed (emails and
+other follow-up work, see ``orders.tasks``) is queued as jobs in the same
+transaction instead of running inside the request; the jobs, including
+those the Order signals queue, are written with a single INSERT.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from cart import reservations
+from cart.models import CartItem
+from jobs.queue import batched, enqueue, enqueue_once
+from . import pricing, recommendations, tasks
+from .models import Order, OrderItem
+
+
+class EmptyCart(Exception):
+    """The cart has nothing to check out"""
+
+
+def cart_lines(cart):
+    """The cart's items with their products and categories (which pricing needs), in one query"""
+    return list(CartItem.objects.filter(cart=cart).select_related('product__category'))
+
+
+@transaction.atomic
+@batched()
+def place_order(cart, user, address, order_number, lines=None):
+    """
+    Create the order for ``cart``, take its stock and empty the cart.
+
+    ``lines`` may pass the cart's already loaded items (``cart_lines``).
+    The totals come from the cart's quote for the address's state
+    (``orders.pricing``), which the checkout page has usually cached.
+    Raises EmptyCart, or store.inventory.OutOfStock if any product no
+    longer has the stock, in which case nothing is written.
+    """
+    if lines is None:
+        lines = cart_lines(cart)
+    if not lines:
+        raise EmptyCart
+    order = Order.objects.create(
+        order_number=order_number,
+        user=user,
+        shipping_name=address.full_name,
+        shipping_phone=address.phone_number,
+        shipping_address_line1=address.address_line1,
+        shipping_address_line2=address.address_line2,
+        shipping_city=address.city,
+        shipping_state=address.state,
+        shipping_postal_code=address.postal_code,
+        shipping_country=address.country,
+        payment_status='paid',  # Mock payment - always succeeds
+        status='processing',
+        **pricing.quote(cart, lines, address.state).totals,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=line.product,
+            product_name=line.product.name,
+            product_price=line.product.price,
+            quantity=line.quantity,
+            subtotal=line.get_subtotal(),
+        )
+        for line in lines
+    ])
+
+    reservations.commit(cart, {line.product_id: line.quantity for line in lines})
+    cart.clear()
+    enqueue(tasks.send_order_confirmation, order_id=order.pk)
+    # A full rebuild covers every order placed until it runs, so one is queued per burst
+    enqueue_once(tasks.refresh_recommendations, delay=getattr(
+        settings, 'RECOMMENDATIONS_REFRESH_DELAY', recommendations.DEFAULT_REFRESH_DELAY,
+    ))
+    return order
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from . import tasks
+from .models import Order
+
+
+@receiver(post_save, sender=Order)
+def queue_invoice(sender, instance, created, raw=False, **kwargs):
+    """Render the invoice of new orders, and again when the status it shows changes"""
+    if raw:
+        return
+    if created or instance.has_changed('status', 'payment_status'):
+        enqueue(tasks.render_invoice, order_id=instance.pk)
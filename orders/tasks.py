@@ -0,0 +1,36 @@
+"""
+Background work that follows an order, run by the job queue (see jobs.queue).
+
+Checkout only enqueues these; each must be safe to run more than once.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from . import invoices, recommendations
+from .models import Order
+
+
+def send_order_confirmation(order_id):
+    """Email the customer a summary of their order"""
+    order = Order.objects.select_related('user').prefetch_related('items').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    send_mail(
+        f'Your PyKart order {order.order_number}',
+        render_to_string('orders/emails/order_confirmation.txt', {'order': order}),
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+    )
+
+
+def render_invoice(order_id):
+    """Render and store the order's HTML and PDF invoice"""
+    order = Order.objects.filter(pk=order_id).first()
+    if order is not None:
+        invoices.render(order)
+
+
+def refresh_recommendations():
+    """Rebuild the "frequently bought together" neighbours from the order history"""
+    recommendations.rebuild_neighbors()
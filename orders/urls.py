@@ -9,5 +9,6 @@ urlpatterns = [
     path('history/', views.order_history, name='order_history'),
     path('detail/<str:order_number>/', views.order_detail, name='order_detail'),
     path('invoice/<str:order_number>/', views.invoice, name='invoice'),
+    path('invoice/<str:order_number>/pdf/', views.invoice_pdf, name='invoice_pdf'),
 ]
 
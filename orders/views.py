@@ -1,153 +1,203 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from decimal import Decimal, InvalidOperation
+
+from django.http import FileResponse, Http404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
-from decimal import Decimal
-import random
-import string
-from cart.models import Cart, CartItem
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from cart.views import get_cart, remember_cart_count
 from accounts.models import Address
+from archive.archiver import find_order
+from archive.models import ArchivedOrder, ArchivedOrderItem
+from pykart.querycount import query_budget
+from store.fragments import cached_fragment
+from store.inventory import OutOfStock
+from store.pagination import keyset_page
+from .invoices import current_invoice
 from .models import Order, OrderItem
-
-
-def generate_order_number():
-    """Generate unique order number"""
-    timestamp = timezone.now().strftime('%Y%m%d')
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f'ORD-{timestamp}-{random_str}'
+from .numbers import next_order_number
+from . import pricing
+from .services import cart_lines, place_order
 
 
 @login_required
+@query_budget(23)
 def checkout(request):
     """Checkout page - review cart and place order"""
     # Get user's cart
-    try:
-        cart = Cart.objects.get(user=request.user)
-        cart_items = cart.items.all()
-    except Cart.DoesNotExist:
-        messages.error(request, 'Your cart is empty.')
-        return redirect('cart:view_cart')
-    
-    if not cart_items.exists():
+    cart = get_cart(request)
+    cart_items = cart_lines(cart) if cart is not None else []
+    if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('cart:view_cart')
     
     # Get user's addresses
-    addresses = Address.objects.filter(user=request.user)
+    addresses = list(Address.objects.filter(user=request.user))
+    default = next((address for address in addresses if address.is_default), addresses[0] if addresses else None)
     
-    # Calculate totals
-    subtotal = cart.get_total()
-    tax = subtotal * Decimal('0.10')  # 10% tax (mock)
-    shipping_cost = Decimal('10.00') if subtotal < Decimal('100') else Decimal('0.00')  # Free shipping over ₹100
-    total = subtotal + tax + shipping_cost
+    def review(address):
+        # Priced for the selected address; placing the order to it reuses this quote
+        quote = pricing.quote(cart, cart_items, address.state if address else None)
+        return {
+            'cart': cart,
+            'cart_items': cart_items,
+            'addresses': addresses,
+            'default_address': address,
+            **quote.totals,
+        }
     
     if request.method == 'POST':
         # Get selected address
         address_id = request.POST.get('address_id')
         if not address_id:
             messages.error(request, 'Please select a shipping address.')
-            return render(request, 'orders/checkout.html', {
-                'cart': cart,
-                'cart_items': cart_items,
-                'addresses': addresses,
-                'subtotal': subtotal,
-                'tax': tax,
-                'shipping_cost': shipping_cost,
-                'total': total,
-            })
+            return render(request, 'orders/checkout.html', review(default))
         
-        try:
-            address = Address.objects.get(id=address_id, user=request.user)
-        except Address.DoesNotExist:
+        address = next((address for address in addresses if str(address.pk) == address_id), None)
+        if address is None:
             messages.error(request, 'Invalid address selected.')
-            return render(request, 'orders/checkout.html', {
-                'cart': cart,
-                'cart_items': cart_items,
-                'addresses': addresses,
-                'subtotal': subtotal,
-                'tax': tax,
-                'shipping_cost': shipping_cost,
-                'total': total,
-            })
+            return render(request, 'orders/checkout.html', review(default))
         
-        # Create order
-        order_number = generate_order_number()
-        order = Order.objects.create(
-            order_number=order_number,
-            user=request.user,
-            shipping_name=address.full_name,
-            shipping_phone=address.phone_number,
-            shipping_address_line1=address.address_line1,
-            shipping_address_line2=address.address_line2,
-            shipping_city=address.city,
-            shipping_state=address.state,
-            shipping_postal_code=address.postal_code,
-            shipping_country=address.country,
-            subtotal=subtotal,
-            tax=tax,
-            shipping_cost=shipping_cost,
-            total=total,
-            payment_status='paid',  # Mock payment - always succeeds
-            status='processing',
-        )
-        
-        # Create order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                product_name=cart_item.product.name,
-                product_price=cart_item.product.price,
-                quantity=cart_item.quantity,
-                subtotal=cart_item.get_subtotal(),
-            )
-            
-            # Update product stock
-            cart_item.product.stock -= cart_item.quantity
-            cart_item.product.save()
+        # The page showed the total for the address preselected when it was
+        # rendered; never charge a total for another address unseen
+        context = review(address)
+        try:
+            shown = Decimal(request.POST.get('quoted_total', ''))
+        except InvalidOperation:
+            shown = None
+        if shown != context['total']:
+            messages.warning(request, 'The total has been updated for the selected address. '
+                                      'Please review it and place the order again.')
+            return render(request, 'orders/checkout.html', context)
         
-        # Clear cart
-        cart_items.delete()
+        try:
+            order = place_order(cart, request.user, address, next_order_number(), lines=cart_items)
+        except OutOfStock as exc:
+            names = ', '.join(item.product.name for item in cart_items if item.product_id in exc.product_ids)
+            messages.error(request, f'Not enough stock left for {names}. Please update your cart.')
+            return redirect('cart:view_cart')
         
-        messages.success(request, f'Order placed successfully! Order number: {order_number}')
-        return redirect('orders:order_confirmation', order_number=order_number)
+        messages.success(request, f'Order placed successfully! Order number: {order.order_number}')
+        return remember_cart_count(redirect('orders:order_confirmation', order_number=order.order_number), cart)
     
-    context = {
-        'cart': cart,
-        'cart_items': cart_items,
-        'addresses': addresses,
-        'subtotal': subtotal,
-        'tax': tax,
-        'shipping_cost': shipping_cost,
-        'total': total,
-    }
-    return render(request, 'orders/checkout.html', context)
+    return render(request, 'orders/checkout.html', review(default))
+
+
+def _find_order_or_404(request, order_number):
+    # Old finished orders may have been moved to the archive
+    try:
+        return find_order(order_number, user=request.user)
+    except Order.DoesNotExist:
+        raise Http404('No such order')
 
 
 @login_required
+@query_budget(6)
 def order_confirmation(request, order_number):
     """Order confirmation page after successful checkout"""
-    order = get_object_or_404(Order, order_number=order_number, user=request.user)
+    order = _find_order_or_404(request, order_number)
     return render(request, 'orders/order_confirmation.html', {'order': order})
 
 
+HISTORY_PAGE_SIZE = 10
+HISTORY_PREVIEW_ITEMS = 3
+
+
+def _item_count(item_model):
+    # A correlated count keeps the page query a plain range scan of the
+    # (user, -created_at, -id) index; a JOIN + GROUP BY would group every order first.
+    counts = item_model.objects.filter(order=OuterRef('pk')).values('order').annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 @login_required
+@query_budget(7)
 def order_history(request):
-    """List all orders for the current user"""
-    orders = Order.objects.filter(user=request.user)
-    return render(request, 'orders/order_history.html', {'orders': orders})
+    """List the current user's orders, newest first, one page at a time; ?archived=1 lists archived ones"""
+    archived = request.GET.get('archived') == '1'
+    if archived:
+        # Products are in another database than archived items, so they are prefetched
+        order_model, previews = ArchivedOrder, ArchivedOrderItem.objects.prefetch_related('product')
+    else:
+        order_model, previews = Order, OrderItem.objects.select_related('product')
+    orders = (
+        order_model.objects.filter(user=request.user)
+        .annotate(item_count=_item_count(previews.model))
+        .prefetch_related(Prefetch(
+            'items',
+            # A sliced prefetch is one ROW_NUMBER() query for the whole page
+            queryset=previews.order_by('id')[:HISTORY_PREVIEW_ITEMS],
+            to_attr='preview_items',
+        ))
+    )
+    page = keyset_page(orders, cursor=request.GET.get('cursor'), per_page=HISTORY_PAGE_SIZE)
+    return render(request, 'orders/order_history.html', {
+        'orders': page.items,
+        'next_cursor': page.next_cursor,
+        'first_page': not request.GET.get('cursor'),
+        'archived': archived,
+        # Offered once the recent orders run out
+        'has_archived': not archived and not page.has_next
+                        and ArchivedOrder.objects.filter(user=request.user).exists(),
+    })
+
+
+def _items_table(order):
+    def build():
+        # Works for archived orders too, whose products are in another database
+        items = order.items.prefetch_related('product')
+        return render_to_string('orders/includes/order_items.html', {'items': items})
+
+    # Line items never change after checkout, so the order's own version is enough
+    return cached_fragment('order_items', order.pk, [order.updated_at], build)
 
 
+# The order and invoice budgets allow for rendering an invoice the job has not rendered yet
 @login_required
+@query_budget(14)
 def order_detail(request, order_number):
     """Order detail page with invoice"""
-    order = get_object_or_404(Order, order_number=order_number, user=request.user)
-    return render(request, 'orders/order_detail.html', {'order': order})
+    order = _find_order_or_404(request, order_number)
+    context = {
+        'order': order,
+        'invoice': current_invoice(order),
+        'items_table': _items_table(order),
+    }
+    return render(request, 'orders/order_detail.html', context)
+
+
+def _serve_invoice(request, order_number, kind, content_type, as_attachment):
+    order = _find_order_or_404(request, order_number)
+    invoice = current_invoice(order)
+    digest = getattr(invoice, f'{kind}_digest')
+    etag = f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(
+            getattr(invoice, kind).open('rb'), content_type=content_type,
+            as_attachment=as_attachment, filename=f'invoice-{order.order_number}.{kind}',
+        )
+    response['ETag'] = etag
+    if request.GET.get('v') == digest:
+        # Versioned URLs always point at the same bytes
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
 
 
 @login_required
+@query_budget(14)
 def invoice(request, order_number):
     """Invoice view for printing/downloading"""
-    order = get_object_or_404(Order, order_number=order_number, user=request.user)
-    return render(request, 'orders/invoice.html', {'order': order})
+    return _serve_invoice(request, order_number, 'html', 'text/html; charset=utf-8', as_attachment=False)
+
 
+@login_required
+@query_budget(14)
+def invoice_pdf(request, order_number):
+    """Invoice as a PDF download"""
+    return _serve_invoice(request, order_number, 'pdf', 'application/pdf', as_attachment=True)
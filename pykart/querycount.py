@@ -0,0 +1,144 @@
+"""
+Per-request query budgets and N+1 detection.
+
+``QueryRecorder`` hooks ``connection.execute_wrapper`` (so it works with
+DEBUG off) and groups the statements it sees by *shape*: the SQL with its
+placeholders, with ``IN (%s, %s, ...)`` lists collapsed, so the same lookup
+for different rows counts as one shape.  A shape that repeats
+``QUERY_BUDGET_REPEAT_THRESHOLD`` times or more in one request is almost
+always a per-row lookup that select_related/prefetch_related should fold.
+
+Views declare how many queries they may issue with ``@query_budget(n)``.
+``QueryBudgetMiddleware`` records every request while DEBUG (or
+``QUERY_BUDGET_ENABLED``) is on and logs a warning when a view goes over
+its budget or repeats a query shape; with ``QUERY_BUDGET_RAISE`` it raises
+``QueryBudgetExceeded`` instead, which is handy in test settings.
+
+Tests can wrap a request in ``assert_max_queries(n)`` for the same check.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 10
+DEFAULT_REPEAT_THRESHOLD = 3
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+# Transaction control repeats legitimately and is not an N+1
+_TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class QueryBudgetExceeded(Exception):
+    """A request issued more queries than its view's budget allows"""
+
+
+def query_shape(sql):
+    """Normalise a statement so per-row variants of the same query compare equal"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _NUMBER.sub('N', sql)
+
+
+def query_budget(max_queries):
+    """Declare how many queries a view may issue per request"""
+    def decorator(view_func):
+        # Decorators applied on top (login_required, ...) copy the attribute over
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryRecorder:
+    """Record the statements executed on one or more database connections"""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self._stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        for alias in self.aliases:
+            wrapper = connections[alias].execute_wrapper(self)
+            wrapper.__enter__()
+            self._stack.append(wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self._stack:
+            self._stack.pop().__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """Return [(shape, times)] for shapes executed ``threshold`` times or more"""
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        shapes = Counter(
+            query_shape(sql) for sql in self.queries
+            if not sql.lstrip().upper().startswith(_TRANSACTION_STATEMENTS)
+        )
+        return [(shape, times) for shape, times in shapes.most_common() if times >= threshold]
+
+    def report(self, max_queries=None, threshold=None):
+        """Describe budget overruns and repeated shapes; empty if within budget"""
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f'{self.count} queries, budget is {max_queries}')
+        for shape, times in self.repeated(threshold):
+            problems.append(f'{times}x {shape}')
+        return problems
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=None, threshold=None):
+    """
+    Fail if the block runs more than ``max_queries`` queries or repeats a
+    query shape (N+1), e.g. around ``client.get(url)`` in a test.
+    """
+    with QueryRecorder(using) as recorder:
+        yield recorder
+    problems = recorder.report(max_queries, threshold)
+    if problems:
+        raise AssertionError('Query budget exceeded:\n  ' + '\n  '.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """Warn (or raise) when a request exceeds its view's query budget or repeats a query shape"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', None)
+        if budget is None:
+            budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', DEFAULT_BUDGET)
+        problems = recorder.report(budget)
+        response['X-Query-Count'] = str(recorder.count)
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(problems)
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
@@ -4,6 +4,7 @@ Django settings for pykart project.
 
 from pathlib import Path
 import os
+from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,11 +35,16 @@ INSTALLED_APPS = [
     'cart',
     'accounts',
     'orders',
+    'jobs',
+    'reports',
+    'archive',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'pykart.querycount.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cart.middleware.SessionKeyMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -59,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cart.context_processors.cart_summary',
             ],
         },
     },
@@ -74,9 +81,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # Archived orders (see archive/archiver.py); create its tables with
+    # `manage.py migrate --database archive`
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'archive.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['archive.routers.ArchiveRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Point this at a shared backend (Memcached/Redis) when running several
+# workers, so fragment rebuild locks are shared between them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pykart',
     }
 }
 
+# How long rendered catalog fragments are kept (seconds)
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Query budgets (see pykart/querycount.py).  The middleware only runs while
+# DEBUG is on unless QUERY_BUDGET_ENABLED says otherwise; views without a
+# @query_budget get QUERY_BUDGET_DEFAULT, and QUERY_BUDGET_RAISE turns the
+# warnings into errors (useful in test settings).
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+QUERY_BUDGET_RAISE = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,6 +165,50 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cart storage backends (see cart/storage.py)
+CART_USER_STORAGE = 'cart.storage.DatabaseCartStorage'
+CART_ANONYMOUS_STORAGE = 'cart.storage.SessionCartStorage'
+
+# Readable cookie mirroring the cart badge count, refreshed by every cart
+# mutation so pages restored from the browser cache can show the right count
+CART_COUNT_COOKIE = 'cart_count'
+
+# Abandoned cart reaper (see cart/reaper.py): anonymous carts untouched for
+# CART_ABANDONED_AFTER (or whose session expired) are deleted in batches of
+# CART_REAPER_BATCH_SIZE by `manage.py reap_carts`, and every
+# CART_REAPER_INTERVAL seconds in each web process when that is set.
+CART_ABANDONED_AFTER = timedelta(days=30)
+CART_REAPER_BATCH_SIZE = 500
+CART_REAPER_INTERVAL = None
+
+# How long adding to the cart holds the units for that cart (see cart/reservations.py)
+CART_RESERVATION_TTL = timedelta(minutes=15)
+
+# Order numbers reserved per database round trip by each process (see orders/numbers.py)
+ORDER_NUMBER_BLOCK_SIZE = 50
+
+# Delivered and cancelled orders unchanged for ORDER_ARCHIVE_AFTER are moved
+# to the archive database in batches by `manage.py archive_orders`
+ORDER_ARCHIVE_AFTER = timedelta(days=180)
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# Background job queue (see jobs/queue.py), run with `manage.py run_worker`
+JOBS_LEASE = timedelta(minutes=5)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = timedelta(seconds=10)
+JOBS_BACKOFF_MAX = timedelta(hours=1)
+JOBS_KEEP_DONE = timedelta(days=7)
+
+# Checkout queues a rebuild of the product recommendations to run this long
+# after the first order of a burst (see orders/recommendations.py)
+RECOMMENDATIONS_REFRESH_DELAY = timedelta(minutes=15)
+# Rebuilds only read the order items of this many most recent orders
+RECOMMENDATIONS_MAX_ORDERS = 200000
+
+# Emails are printed to the console in development
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'PyKart <orders@pykart.local>'
+
 # Authentication settings
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'store:home'
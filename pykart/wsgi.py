@@ -15,3 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pykart.settings')
 
 application = get_wsgi_application()
 
+
+# Periodic cart reaping, if CART_REAPER_INTERVAL is set (needs the app registry)
+from cart.reaper import start_scheduler  # noqa: E402
+
+start_scheduler()
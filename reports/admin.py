@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from . import rollups
+from .models import DailySales
+
+
+RANGES = [7, 30, 90, 365]
+
+
+@admin.register(DailySales)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    """The daily sales changelist is a dashboard over the rollups"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            days = 30
+        if days not in RANGES:
+            days = 30
+        end = timezone.localdate()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales dashboard',
+            'opts': self.model._meta,
+            'ranges': RANGES,
+            'selected_range': days,
+            **rollups.summary(end - timedelta(days=days - 1), end),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/reports/sales_dashboard.html', context)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import DEFAULT_CHUNK_SIZE, backfill, clear
+
+
+class Command(BaseCommand):
+    help = 'Recount the sales rollups from the hot and archived order history, one chunk of orders per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Orders per transaction')
+        parser.add_argument('--resume', action='store_true',
+                            help='Keep the rollups and only count orders that are not counted yet')
+
+    def handle(self, *args, **options):
+        if not options['resume']:
+            clear()
+        counted = chunks = 0
+        for last_id, orders in backfill(chunk_size=options['chunk_size']):
+            counted += orders
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Counted {counted} orders, up to order id {last_id}.')
+        self.stdout.write(self.style.SUCCESS(f'Counted {counted} orders in {chunks} chunks.'))
@@ -0,0 +1,71 @@
+from django.db import models
+from store.models import Category, Product
+
+
+class DailySales(models.Model):
+    """Totals of the orders placed on one day (see reports.rollups)"""
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.total}"
+
+
+class ProductSales(models.Model):
+    """Units and revenue of one product on one day"""
+    date = models.DateField()
+    # No database constraint: the history outlives deleted products
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                                related_name='+')
+    product_name = models.CharField(max_length=200)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'product sales'
+        unique_together = ['date', 'product']
+
+    def __str__(self):
+        return f"{self.date} {self.product_name}: {self.units} units"
+
+
+class CategorySales(models.Model):
+    """Units and revenue of one category on one day"""
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                                 related_name='+')
+    category_name = models.CharField(max_length=100)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'category sales'
+        unique_together = ['date', 'category']
+
+    def __str__(self):
+        return f"{self.date} {self.category_name}: {self.units} units"
+
+
+class CountedOrder(models.Model):
+    """
+    An order currently included in the rollups.  Applying an order checks
+    and records it here in the same transaction, so running the update job
+    twice cannot count it twice.
+    """
+    # A plain id rather than a foreign key: archived orders stay counted
+    order_id = models.BigIntegerField(primary_key=True)
+
+    def __str__(self):
+        return f"Order {self.order_id}"
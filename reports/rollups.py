@@ -0,0 +1,186 @@
+"""
+Sales rollups.
+
+Reporting never scans Order/OrderItem: the sales figures live in three
+small tables that are kept up to date as orders come and go,
+
+* DailySales: orders, units and money per day;
+* ProductSales: orders, units and revenue per product per day;
+* CategorySales: units and revenue per category per day,
+
+where a day is the local date the order was placed.  Their size grows with
+days x products rather than with the number of order items, so a dashboard
+over any date range reads a bounded number of rows.
+
+An order counts while it is not cancelled.  ``sync_order`` (run as a job
+queued by ``reports.signals`` when an order is placed or its status
+changes) adds the order's figures to the rollups, or subtracts them once it
+is cancelled.  Which orders are counted is recorded in CountedOrder in the
+same transaction as the increments, so a job that runs twice or out of
+order cannot count an order twice.  Increments are UPDATE ... SET x = x + n,
+so concurrent workers never overwrite each other's figures.
+
+``backfill`` counts, chunk by chunk in id order, every hot or archived
+order that is not counted yet (``manage.py rebuild_reports`` runs
+``clear`` first).  It is safe to run while orders are being placed and
+resumes where it stopped.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+
+from archive.models import ArchivedOrder, ArchivedOrderItem
+from orders.models import Order, OrderItem
+from store.models import Product
+from .models import CategorySales, CountedOrder, DailySales, ProductSales
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def counts(order):
+    """Whether ``order`` belongs in the sales figures"""
+    return order.status != 'cancelled'
+
+
+def _bump(model, key, deltas, defaults=None):
+    """Add ``deltas`` to the rollup row identified by ``key``, creating it if needed"""
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another worker created the row since the UPDATE above
+        model.objects.filter(**key).update(**changes)
+
+
+def _apply(orders, items, sign):
+    """
+    Add (``sign`` 1) or subtract (-1) the figures of the ``orders`` queryset,
+    whose items are ``items``, to the rollups.  Orders may be hot or
+    archived; product categories are looked up separately because archived
+    items can live in another database than the catalog.
+    """
+    items = items.annotate(day=TruncDate('order__created_at')).order_by()
+    units = dict(items.values('day').annotate(units=Sum('quantity')).values_list('day', 'units'))
+
+    days = (
+        orders.annotate(day=TruncDate('created_at')).order_by().values('day')
+        .annotate(orders=Count('id'), subtotal=Sum('subtotal'), tax=Sum('tax'),
+                  shipping=Sum('shipping_cost'), total=Sum('total'))
+    )
+    for row in days:
+        _bump(DailySales, {'date': row['day']}, {
+            'orders': sign * row['orders'], 'units': sign * units.get(row['day'], 0),
+            'subtotal': sign * row['subtotal'], 'tax': sign * row['tax'],
+            'shipping': sign * row['shipping'], 'total': sign * row['total'],
+        })
+
+    products = list(items.values('day', 'product_id').annotate(
+        orders=Count('order_id', distinct=True), units=Sum('quantity'), revenue=Sum('subtotal'),
+        name=Max('product_name'),
+    ))
+    category_of = {
+        pk: (category_id, name) for pk, category_id, name in Product.objects.filter(
+            pk__in={row['product_id'] for row in products if row['product_id']}
+        ).values_list('pk', 'category_id', 'category__name')
+    }
+    categories = {}
+    for row in products:
+        _bump(
+            ProductSales, {'date': row['day'], 'product_id': row['product_id']},
+            {'orders': sign * row['orders'], 'units': sign * row['units'], 'revenue': sign * row['revenue']},
+            defaults={'product_name': row['name']},
+        )
+        category_id, name = category_of.get(row['product_id'], (None, 'Unknown'))
+        totals = categories.setdefault((row['day'], category_id), {'units': 0, 'revenue': 0, 'name': name})
+        totals['units'] += row['units']
+        totals['revenue'] += row['revenue']
+    for (day, category_id), totals in categories.items():
+        _bump(
+            CategorySales, {'date': day, 'category_id': category_id},
+            {'units': sign * totals['units'], 'revenue': sign * totals['revenue']},
+            defaults={'category_name': totals['name']},
+        )
+
+
+@transaction.atomic
+def sync_order(order_id):
+    """Make the rollups agree with whether the order currently counts"""
+    order = Order.objects.select_for_update().filter(pk=order_id).first()
+    if order is None:
+        return
+    counted = CountedOrder.objects.select_for_update().filter(order_id=order_id)
+    if counts(order) and not counted.exists():
+        # The primary key makes a concurrent duplicate fail here, before any increment
+        CountedOrder.objects.create(order_id=order_id)
+        _apply(Order.objects.filter(pk=order_id), OrderItem.objects.filter(order_id=order_id), 1)
+    elif not counts(order) and counted.exists():
+        _apply(Order.objects.filter(pk=order_id), OrderItem.objects.filter(order_id=order_id), -1)
+        counted.delete()
+
+
+def backfill(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Count every order that is not counted yet, hot orders first and then
+    archived ones, ``chunk_size`` orders per transaction.  Yields the last
+    order id and number of orders counted after each chunk.
+    """
+    for order_model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+        last = 0
+        while True:
+            ids = list(
+                order_model.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                # Evaluated in Python: archived orders may be in another database than the ledger
+                counted = set(CountedOrder.objects.filter(order_id__in=ids).values_list('order_id', flat=True))
+                pending = [
+                    pk for pk in order_model.objects.filter(pk__in=ids).exclude(status='cancelled')
+                    .values_list('pk', flat=True) if pk not in counted
+                ]
+                CountedOrder.objects.bulk_create([CountedOrder(order_id=pk) for pk in pending])
+                if pending:
+                    _apply(
+                        order_model.objects.filter(pk__in=pending), item_model.objects.filter(order_id__in=pending), 1,
+                    )
+            last = ids[-1]
+            yield last, len(pending)
+
+
+def clear():
+    """Empty the rollups, so that ``backfill`` recounts every order"""
+    with transaction.atomic():
+        for model in (DailySales, ProductSales, CategorySales, CountedOrder):
+            model.objects.all().delete()
+
+
+def summary(start, end, top=10):
+    """Figures for the dates from ``start`` to ``end`` inclusive, read from the rollups only"""
+    days = DailySales.objects.filter(date__range=(start, end))
+    totals = days.aggregate(
+        orders=Sum('orders'), units=Sum('units'), subtotal=Sum('subtotal'), tax=Sum('tax'),
+        shipping=Sum('shipping'), total=Sum('total'),
+    )
+    products = (
+        ProductSales.objects.filter(date__range=(start, end)).order_by().values('product_id')
+        .annotate(name=Max('product_name'), orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .filter(units__gt=0).order_by('-revenue')[:top]
+    )
+    categories = (
+        CategorySales.objects.filter(date__range=(start, end)).order_by().values('category_id')
+        .annotate(name=Max('category_name'), units=Sum('units'), revenue=Sum('revenue'))
+        .filter(units__gt=0).order_by('-revenue')
+    )
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'days': list(days.order_by('-date')),
+        'top_products': list(products),
+        'categories': list(categories),
+    }
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from orders.models import Order
+from . import tasks
+
+
+@receiver(post_save, sender=Order)
+def queue_rollup_update(sender, instance, created, raw=False, **kwargs):
+    """Keep the sales rollups in step with placed and cancelled orders"""
+    if raw:
+        return
+    if created or instance.has_changed('status'):
+        enqueue(tasks.update_rollups, order_id=instance.pk)
@@ -0,0 +1,7 @@
+"""Background tasks of the reports app, queued with jobs.queue.enqueue"""
+from . import rollups
+
+
+def update_rollups(order_id):
+    """Add a new order to the sales rollups, or take a cancelled one out"""
+    rollups.sync_order(order_id)
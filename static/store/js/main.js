@@ -4,72 +4,179 @@
 document.addEventListener('DOMContentLoaded', function() {
     // Add to cart buttons
     const addToCartButtons = document.querySelectorAll('.btn-add-cart, .btn-add-cart-large');
-    
-    addToCartButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault();
-            const productId = this.getAttribute('data-product-id');
-            const productSlug = this.getAttribute('data-product-slug');
-            
-            // Get quantity if on product detail page
-            let quantity = 1;
-            const quantityInput = document.getElementById('quantity');
-            if (quantityInput) {
-                quantity = parseInt(quantityInput.value) || 1;
-            }
-            
-            // Disable button to prevent double clicks
-            this.disabled = true;
-            const originalText = this.textContent;
-            this.textContent = 'Adding...';
-            
-            // Create form data
-            const formData = new FormData();
-            formData.append('quantity', quantity);
-            const csrfToken = getCookie('csrftoken');
-            if (csrfToken) {
-                formData.append('csrfmiddlewaretoken', csrfToken);
+    addToCartButtons.forEach(bindAddToCart);
+
+    // Infinite scroll for paginated product grids
+    setupInfiniteScroll();
+
+    // The cart count is rendered by the server, so nothing is fetched on load
+});
+
+// Pages restored from the back/forward cache show the count they were
+// rendered with; take the latest one from the cookie instead.
+window.addEventListener('pageshow', function(event) {
+    if (event.persisted) {
+        const count = getCookie('cart_count');
+        if (count !== null) {
+            updateCartCount(count);
+        }
+    }
+});
+
+// Attach the add-to-cart handler to a button
+function bindAddToCart(button) {
+    button.addEventListener('click', function(e) {
+        e.preventDefault();
+        const productId = this.getAttribute('data-product-id');
+        const productSlug = this.getAttribute('data-product-slug');
+        
+        // Get quantity if on product detail page
+        let quantity = 1;
+        const quantityInput = document.getElementById('quantity');
+        if (quantityInput) {
+            quantity = parseInt(quantityInput.value) || 1;
+        }
+        
+        // Disable button to prevent double clicks
+        this.disabled = true;
+        const originalText = this.textContent;
+        this.textContent = 'Adding...';
+        
+        // Create form data
+        const formData = new FormData();
+        formData.append('quantity', quantity);
+        const csrfToken = getCookie('csrftoken');
+        if (csrfToken) {
+            formData.append('csrfmiddlewaretoken', csrfToken);
+        }
+        
+        // Send AJAX request
+        fetch(`/cart/add/${productId}/`, {
+            method: 'POST',
+            body: formData,
+            headers: {
+                'X-Requested-With': 'XMLHttpRequest',
+            },
+            credentials: 'same-origin',
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Update cart count
+                updateCartCount(data.cart_count);
+                
+                // Show success message
+                showMessage(data.message, 'success');
+                
+                // Re-enable button
+                this.disabled = false;
+                this.textContent = originalText;
+            } else {
+                // Handle error
+                showMessage(data.message || 'Error adding to cart', 'error');
+                this.disabled = false;
+                this.textContent = originalText;
             }
-            
-            // Send AJAX request
-            fetch(`/cart/add/${productId}/`, {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest',
-                },
-                credentials: 'same-origin',
-            })
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            // Fallback: redirect to cart page
+            window.location.href = `/cart/add/${productId}/?quantity=${quantity}`;
+        });
+    });
+}
+
+// Load further pages of a product grid as the visitor scrolls
+function setupInfiniteScroll() {
+    const grid = document.querySelector('.products-grid[data-next-url]');
+    const loadMore = document.querySelector('.load-more');
+    if (!grid || !loadMore || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    let nextUrl = grid.getAttribute('data-next-url');
+    let loading = false;
+
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting || loading || !nextUrl) {
+            return;
+        }
+        loading = true;
+        fetch(nextUrl, { credentials: 'same-origin' })
             .then(response => response.json())
             .then(data => {
-                if (data.success) {
-                    // Update cart count
-                    updateCartCount(data.cart_count);
-                    
-                    // Show success message
-                    showMessage(data.message, 'success');
-                    
-                    // Re-enable button
-                    this.disabled = false;
-                    this.textContent = originalText;
-                } else {
-                    // Handle error
-                    showMessage(data.message || 'Error adding to cart', 'error');
-                    this.disabled = false;
-                    this.textContent = originalText;
+                data.products.forEach(product => {
+                    const card = buildProductCard(product);
+                    grid.appendChild(card);
+                    const button = card.querySelector('.btn-add-cart:not([disabled])');
+                    if (button) {
+                        bindAddToCart(button);
+                    }
+                });
+                nextUrl = data.next;
+                if (!nextUrl) {
+                    observer.disconnect();
+                    loadMore.remove();
                 }
+                loading = false;
             })
             .catch(error => {
-                console.error('Error:', error);
-                // Fallback: redirect to cart page
-                window.location.href = `/cart/add/${productId}/?quantity=${quantity}`;
+                console.error('Error loading products:', error);
+                observer.disconnect();
             });
-        });
     });
-    
-    // Update cart count on page load
-    updateCartCount();
-});
+    observer.observe(loadMore);
+}
+
+// Build a product card element from a JSON listing entry
+function buildProductCard(product) {
+    const card = document.createElement('div');
+    card.className = 'product-card';
+
+    const link = document.createElement('a');
+    link.href = product.url;
+    if (product.image) {
+        const img = document.createElement('img');
+        img.src = product.image;
+        img.alt = product.name;
+        img.className = 'product-image';
+        img.loading = 'lazy';
+        link.appendChild(img);
+    } else {
+        const placeholder = document.createElement('div');
+        placeholder.className = 'product-placeholder';
+        placeholder.innerHTML = '<span>No Image</span>';
+        link.appendChild(placeholder);
+    }
+
+    const info = document.createElement('div');
+    info.className = 'product-info';
+    const name = document.createElement('h3');
+    name.className = 'product-name';
+    name.textContent = product.name;
+    const price = document.createElement('p');
+    price.className = 'product-price';
+    price.textContent = '₹' + product.price;
+    const stock = document.createElement('span');
+    stock.className = 'stock-status ' + (product.in_stock ? 'in-stock' : 'out-of-stock');
+    stock.textContent = product.in_stock ? 'In Stock' : 'Out of Stock';
+    info.append(name, price, stock);
+    link.appendChild(info);
+    card.appendChild(link);
+
+    const button = document.createElement('button');
+    button.className = 'btn-add-cart';
+    if (product.in_stock) {
+        button.setAttribute('data-product-id', product.id);
+        button.setAttribute('data-product-slug', product.slug);
+        button.textContent = 'Add to Cart';
+    } else {
+        button.disabled = true;
+        button.textContent = 'Out of Stock';
+    }
+    card.appendChild(button);
+    return card;
+}
 
 // Function to get CSRF token from cookies
 function getCookie(name) {
@@ -90,10 +197,14 @@ function getCookie(name) {
 // Function to update cart count
 function updateCartCount(count) {
     const cartCount = document.getElementById('cart-count');
+    if (count !== undefined) {
+        document.cookie = `cart_count=${encodeURIComponent(count)}; path=/; SameSite=Lax`;
+    }
     if (cartCount) {
         if (count !== undefined) {
             cartCount.textContent = count;
         } else {
+            // Fallback when no count is known
             // Fetch current count
             fetch('/cart/count/')
                 .then(response => response.json())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, Product, ProductImage
+from .search import get_search_backend
 
 
 class ProductImageInline(admin.TabularInline):
@@ -9,7 +10,8 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'product_count', 'in_stock_count', 'min_price', 'created_at']
+    readonly_fields = ['product_count', 'in_stock_count', 'min_price']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
 
@@ -23,6 +25,12 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductImageInline]
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the search index instead of icontains scans over every product
+        if not search_term.strip():
+            return queryset, False
+        return get_search_backend().filter(queryset, search_term), False
+
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
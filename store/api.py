@@ -0,0 +1,214 @@
+"""
+Read-only JSON catalog API.
+
+Every endpoint supports conditional GET: the ETag and Last-Modified headers
+are derived from ``max(updated_at)`` and the row count of the rows the
+response depends on (ProductImage changes bump ``Product.updated_at``, see
+``store.signals``), which is one small aggregate query.  A matching
+``If-None-Match`` or ``If-Modified-Since`` is answered with 304 before the
+body is built.
+
+``?fields=id,name,price`` limits both the serialized fields and the columns
+that are loaded, and ``/api/products/?ids=1,2,3`` (or ``?slugs=a,b``)
+fetches several products in one round trip.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from pykart.querycount import query_budget
+
+from . import images
+from .models import Category, Product
+from .views import _category_listing, _listing_query
+
+
+MAX_BATCH_SIZE = 100
+
+# field name: (columns to load, serializer)
+CATEGORY_FIELDS = {
+    'id': (['id'], lambda category: category.id),
+    'name': (['name'], lambda category: category.name),
+    'slug': (['slug'], lambda category: category.slug),
+    'image': (['image'], lambda category: images.derivative_url(category.image, 'card') or None),
+    'product_count': (['product_count'], lambda category: category.product_count),
+    'in_stock_count': (['in_stock_count'], lambda category: category.in_stock_count),
+    'min_price': (['min_price'], lambda category: str(category.min_price) if category.min_price is not None else None),
+    'url': (['slug'], lambda category: category.get_absolute_url()),
+    'products_url': (['slug'], lambda category: reverse('store:api_category_products', kwargs={'slug': category.slug})),
+}
+
+PRODUCT_FIELDS = {
+    'id': (['id'], lambda product: product.id),
+    'name': (['name'], lambda product: product.name),
+    'slug': (['slug'], lambda product: product.slug),
+    'category': (['category__slug'], lambda product: product.category.slug),
+    'price': (['price'], lambda product: str(product.price)),
+    # Only whether the product is in stock, as the catalog pages show it: the
+    # units a cart can take also depend on other carts' holds, so the raw
+    # stock is not published
+    'in_stock': (['stock'], lambda product: product.stock > 0),
+    'description': (['description'], lambda product: product.description),
+    'image': (['main_image'], lambda product: images.derivative_url(product.main_image, 'card') or None),
+    'images': ([], lambda product: [
+        {'url': images.derivative_url(image.image, 'detail'), 'alt': image.alt_text}
+        for image in product.images.all()
+    ]),
+    'url': (['slug'], lambda product: product.get_absolute_url()),
+    'updated_at': (['updated_at'], lambda product: product.updated_at.isoformat()),
+}
+
+DEFAULT_CATEGORY_FIELDS = list(CATEGORY_FIELDS)
+DEFAULT_PRODUCT_LIST_FIELDS = ['id', 'name', 'slug', 'price', 'in_stock', 'image', 'url']
+DEFAULT_PRODUCT_FIELDS = list(PRODUCT_FIELDS)
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _selected_fields(request, available, default):
+    """Fields requested with ``?fields=``; unknown names are ignored"""
+    requested = [name for name in _split(request.GET.get('fields', '')) if name in available]
+    return requested or default
+
+
+def _restrict(queryset, available, fields, extra=()):
+    """Load only the columns the selected fields (and ``extra``) need"""
+    columns = {'id', *extra}
+    for name in fields:
+        columns.update(available[name][0])
+    if any('__' in column for column in columns):
+        queryset = queryset.select_related('category')
+    if 'images' in fields:
+        queryset = queryset.prefetch_related('images')
+    return queryset.only(*columns)
+
+
+def _serialize(obj, available, fields):
+    return {name: available[name][1](obj) for name in fields}
+
+
+def _state(request, *parts):
+    """ETag and Last-Modified for a response built from rows summarised by ``parts``"""
+    last_modified = max((part['modified'] for part in parts if part['modified']), default=None)
+    # The query string selects the representation, so it is part of the tag
+    digest = hashlib.md5(usedforsecurity=False)
+    for value in (request.get_full_path(), *[
+        f"{part['count']}:{part['modified'].isoformat() if part['modified'] else ''}" for part in parts
+    ]):
+        digest.update(str(value).encode())
+        digest.update(b'|')
+    return {'etag': digest.hexdigest(), 'last_modified': last_modified}
+
+
+def _summary(queryset):
+    return queryset.order_by().aggregate(count=Count('pk'), modified=Max('updated_at'))
+
+
+def conditional(state_func):
+    """
+    Like ``condition()``, but computes ETag and Last-Modified with a single
+    call to ``state_func(request, *args, **kwargs)``.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_api_state'):
+            request._api_state = state_func(request, *args, **kwargs)
+        return request._api_state
+
+    def decorator(view):
+        return require_GET(cache_control(max_age=0, must_revalidate=True)(condition(
+            etag_func=lambda request, *args, **kwargs: state(request, *args, **kwargs)['etag'],
+            last_modified_func=lambda request, *args, **kwargs: state(request, *args, **kwargs)['last_modified'],
+        )(view)))
+    return decorator
+
+
+def _categories_state(request):
+    # Product saves are what move the counters, so products version the list too
+    return _state(request, _summary(Category.objects.all()), _summary(Product.objects.all()))
+
+
+@conditional(_categories_state)
+@query_budget(4)
+def categories(request):
+    """All categories with their product counters"""
+    fields = _selected_fields(request, CATEGORY_FIELDS, DEFAULT_CATEGORY_FIELDS)
+    queryset = _restrict(Category.objects.all(), CATEGORY_FIELDS, fields)
+    return JsonResponse({'categories': [_serialize(category, CATEGORY_FIELDS, fields) for category in queryset]})
+
+
+def _category_products_state(request, slug):
+    category = Category.objects.filter(slug=slug).values('pk', 'updated_at').first()
+    if category is None:
+        raise Http404('No category matches the given query.')
+    products = _summary(Product.objects.filter(category_id=category['pk']))
+    return _state(request, {'count': 1, 'modified': category['updated_at']}, products)
+
+
+@conditional(_category_products_state)
+@query_budget(6)
+def category_products(request, slug):
+    """One keyset page of a category's active products, with the listing filters"""
+    category = get_object_or_404(Category, slug=slug)
+    fields = _selected_fields(request, PRODUCT_FIELDS, DEFAULT_PRODUCT_LIST_FIELDS)
+    # The next cursor is built from the sort columns, whatever was selected
+    queryset = _restrict(Product.objects.all(), PRODUCT_FIELDS, fields, extra=['price', 'created_at'])
+    page, filters = _category_listing(request, category, queryset)
+
+    next_url = None
+    if page.has_next:
+        next_url = f"{reverse('store:api_category_products', kwargs={'slug': slug})}?{_listing_query(filters, cursor=page.next_cursor, fields=request.GET.get('fields'))}"
+    return JsonResponse({
+        'category': {'id': category.id, 'name': category.name, 'slug': category.slug},
+        'products': [_serialize(product, PRODUCT_FIELDS, fields) for product in page.items],
+        'next_cursor': page.next_cursor,
+        'next': next_url,
+    })
+
+
+def _batch_filter(request):
+    """Product lookup filter for ``?ids=`` or ``?slugs=``, capped at MAX_BATCH_SIZE"""
+    ids = [value for value in _split(request.GET.get('ids', '')) if value.isdigit()][:MAX_BATCH_SIZE]
+    if ids:
+        return {'pk__in': ids}
+    return {'slug__in': _split(request.GET.get('slugs', ''))[:MAX_BATCH_SIZE]}
+
+
+def _products_state(request):
+    return _state(request, _summary(Product.objects.filter(is_active=True, **_batch_filter(request))))
+
+
+@conditional(_products_state)
+@query_budget(5)
+def products(request):
+    """Batched lookup of active products by id or slug"""
+    fields = _selected_fields(request, PRODUCT_FIELDS, DEFAULT_PRODUCT_LIST_FIELDS)
+    queryset = _restrict(Product.objects.filter(is_active=True, **_batch_filter(request)), PRODUCT_FIELDS, fields)
+    return JsonResponse({'products': [_serialize(product, PRODUCT_FIELDS, fields) for product in queryset]})
+
+
+def _product_state(request, slug):
+    row = Product.objects.filter(slug=slug, is_active=True).values('updated_at', 'category__updated_at').first()
+    if row is None:
+        raise Http404('No product matches the given query.')
+    return _state(
+        request,
+        {'count': 1, 'modified': row['updated_at']},
+        {'count': 1, 'modified': row['category__updated_at']},
+    )
+
+
+@conditional(_product_state)
+@query_budget(5)
+def product_detail(request, slug):
+    """A single active product with its gallery"""
+    fields = _selected_fields(request, PRODUCT_FIELDS, DEFAULT_PRODUCT_FIELDS)
+    queryset = _restrict(Product.objects.filter(is_active=True), PRODUCT_FIELDS, fields)
+    product = get_object_or_404(queryset, slug=slug)
+    return JsonResponse({'product': _serialize(product, PRODUCT_FIELDS, fields)})
@@ -0,0 +1,251 @@
+"""
+Streaming catalog import/export.
+
+Feeds are CSV (with a header row) or JSON Lines, one product per row/line,
+using the columns in ``FIELDS``.  Rows are read lazily and written to the
+database in chunks with bulk_create/bulk_update, so memory use depends on
+the chunk size and not on the size of the feed.
+
+Products are matched on ``slug``; when a row has no slug one is derived
+from the name.  The slugs used so far are remembered for the whole run: a
+row repeating an explicit slug is rejected, and a row whose derived slug
+was already used gets the first numeric suffix that neither the run nor
+the database uses yet, so the outcome does not depend on the chunk size.
+"""
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import counters, facets
+from .models import Category, Product
+from .search import get_search_backend
+from .signals import product_prices_changed
+
+
+FIELDS = ['slug', 'name', 'category', 'price', 'stock', 'description', 'main_image', 'is_active']
+
+UPDATE_FIELDS = ['name', 'category', 'price', 'stock', 'description', 'main_image', 'is_active', 'updated_at']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class CatalogRowError(ValueError):
+    """A feed row that cannot be imported"""
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(handle, fmt):
+    """
+    Yield feed rows as dicts.  A JSON line that cannot be decoded is yielded
+    as the CatalogRowError describing it, so the importer reports it against
+    its line like any other bad row.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(handle)
+        return
+    for line in handle:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield CatalogRowError(f'invalid JSON at column {exc.colno}: {exc.msg}')
+
+
+def write_rows(handle, fmt, rows):
+    """Write feed rows (dicts keyed by FIELDS) to an open text handle"""
+    if fmt == 'csv':
+        writer = csv.DictWriter(handle, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+        return
+    for row in rows:
+        # One write per line: management commands' stdout adds a newline to
+        # any write that does not already end with one
+        handle.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Stream the catalog as feed rows without loading the table"""
+    queryset = queryset if queryset is not None else Product.objects.all()
+    values = queryset.order_by('pk').values_list(
+        'slug', 'name', 'category__slug', 'price', 'stock', 'description', 'main_image', 'is_active',
+    )
+    for slug, name, category, price, stock, description, main_image, is_active in values.iterator(chunk_size=chunk_size):
+        yield {
+            'slug': slug,
+            'name': name,
+            'category': category,
+            'price': str(price),
+            'stock': stock,
+            'description': description,
+            'main_image': main_image or '',
+            'is_active': is_active,
+        }
+
+
+def _resolve_image(value):
+    """Turn an image path from the feed into a storage name under MEDIA_ROOT"""
+    value = (value or '').strip()
+    if not value:
+        return ''
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(value if os.path.isabs(value) else os.path.join(media_root, value))
+    if not path.startswith(media_root + os.sep) or not os.path.exists(path):
+        raise CatalogRowError(f'image not found under MEDIA_ROOT: {value}')
+    return os.path.relpath(path, media_root).replace(os.sep, '/')
+
+
+class CatalogImporter:
+    """Upserts feed rows into Product in bulk, one chunk per transaction"""
+
+    def __init__(self, create_categories=False):
+        self.create_categories = create_categories
+        self.categories = {}
+        self.touched_categories = set()
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.seen_slugs = set()
+
+    def _category_id(self, value):
+        value = (value or '').strip()
+        if not value:
+            raise CatalogRowError('missing category')
+        if value not in self.categories:
+            category = Category.objects.filter(Q(slug=value) | Q(name=value) | Q(slug=slugify(value))).first()
+            if category is None and self.create_categories:
+                category = Category.objects.create(name=value)
+            # Unknown categories are remembered too, so bad rows cost no queries
+            self.categories[value] = category.pk if category else None
+        if self.categories[value] is None:
+            raise CatalogRowError(f'unknown category: {value}')
+        return self.categories[value]
+
+    def _parse(self, row):
+        if isinstance(row, CatalogRowError):
+            raise row
+        if not isinstance(row, dict):
+            raise CatalogRowError(f'expected an object, got {type(row).__name__}')
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise CatalogRowError('missing name')
+        try:
+            price = Decimal(str(row.get('price', '')).strip())
+        except InvalidOperation:
+            raise CatalogRowError(f"invalid price: {row.get('price')!r}")
+        try:
+            stock = int(row.get('stock') or 0)
+        except (TypeError, ValueError):
+            raise CatalogRowError(f"invalid stock: {row.get('stock')!r}")
+        if stock < 0:
+            raise CatalogRowError('stock cannot be negative')
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() in TRUE_VALUES
+        return {
+            'slug': slugify(row.get('slug') or ''),
+            'name': name,
+            'category_id': self._category_id(row.get('category')),
+            'price': price,
+            'stock': stock,
+            'description': row.get('description') or '',
+            'main_image': _resolve_image(row.get('main_image')),
+            'is_active': bool(is_active),
+        }
+
+    def _free_slug(self, base):
+        """The first ``base-N`` slug that neither this run nor the database uses"""
+        suffix = 2
+        while True:
+            slug = f'{base}-{suffix}'
+            if slug not in self.seen_slugs and not Product.objects.filter(slug=slug).exists():
+                return slug
+            suffix += 1
+
+    def _slug(self, values):
+        if values['slug']:
+            # An explicit slug names one product; a second row for it is a feed error
+            if values['slug'] in self.seen_slugs:
+                raise CatalogRowError(f"duplicate slug: {values['slug']}")
+            return values['slug']
+        slug = slugify(values['name'])
+        if not slug:
+            raise CatalogRowError('cannot derive a slug from the name')
+        return self._free_slug(slug) if slug in self.seen_slugs else slug
+
+    def import_chunk(self, rows, first_line=1):
+        """Parse, de-duplicate and upsert one chunk of feed rows"""
+        parsed = []
+        for offset, row in enumerate(rows):
+            try:
+                values = self._parse(row)
+                values['slug'] = self._slug(values)
+            except CatalogRowError as exc:
+                self.errors.append((first_line + offset, str(exc)))
+                continue
+            self.seen_slugs.add(values['slug'])
+            parsed.append(values)
+        if not parsed:
+            return
+
+        now = timezone.now()
+        with transaction.atomic():
+            existing = Product.objects.filter(slug__in=[values['slug'] for values in parsed]).in_bulk(field_name='slug')
+            to_create, to_update = [], []
+            for values in parsed:
+                product = existing.get(values['slug'])
+                if product is None:
+                    to_create.append(Product(**values))
+                    continue
+                # bulk_update builds a CASE per field and row, so rows that a
+                # re-sent feed leaves untouched are not written at all.
+                if all(getattr(product, field) == value for field, value in values.items()):
+                    self.unchanged += 1
+                    continue
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                to_update.append(product)
+
+            Product.objects.bulk_create(to_create)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+            repriced = [
+                product.pk for product in to_update
+                if getattr(product, '_loaded_values', {}).get('price') != product.price
+            ]
+            if repriced:
+                product_prices_changed.send(sender=Product, product_ids=repriced)
+            # Bulk writes skip the Product signals, so index the chunk here;
+            # facet and category counts are rebuilt once per touched category in finish().
+            get_search_backend().index_many(to_create + to_update)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        self.touched_categories.update(values['category_id'] for values in parsed)
+        for product in to_update:
+            loaded = getattr(product, '_loaded_values', {})
+            if 'category_id' in loaded:
+                self.touched_categories.add(loaded['category_id'])
+
+    def finish(self):
+        """Bring derived data that bulk writes bypass back in step"""
+        if self.touched_categories:
+            category_ids = sorted(self.touched_categories)
+            facets.rebuild(category_ids)
+            counters.rebuild(category_ids)
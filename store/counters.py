@@ -0,0 +1,98 @@
+"""
+Denormalized per-category counters.
+
+``Category.product_count``, ``in_stock_count`` and ``min_price`` summarise
+the active products of each category so the home page can show them
+without a COUNT per category.  They are adjusted incrementally from the
+same Product signals as the facet counts (see ``store.signals``), using
+F() deltas so concurrent saves do not lose updates.  ``min_price`` is
+re-read from the (category, is_active, price) index only when a product
+enters or leaves a category or changes price.
+
+``rebuild`` recomputes the counters from the product table and is what
+``manage.py reconcile_category_counters`` runs to repair drift.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Subquery
+
+from .models import Category, Product
+
+
+COUNTER_FIELDS = ['product_count', 'in_stock_count', 'min_price']
+
+
+def _min_price(category_id):
+    return Subquery(
+        Product.objects.filter(category_id=category_id, is_active=True)
+        .order_by('price')
+        .values('price')[:1]
+    )
+
+
+def apply_change(old, new):
+    """
+    Adjust category counters for a product moving from ``old`` to ``new``.
+
+    Both are ``facets.ProductState`` tuples (or None for a created or
+    deleted product).  Each affected category gets at most one UPDATE.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None or not state.is_active:
+            continue
+        deltas[state.category_id][0] += sign
+        if state.stock > 0:
+            deltas[state.category_id][1] += sign
+
+    # Only membership and price changes can move the minimum price
+    old_price = (old.category_id, old.price) if old is not None and old.is_active else None
+    new_price = (new.category_id, new.price) if new is not None and new.is_active else None
+    stale_min = set()
+    if old_price != new_price:
+        stale_min.update(key[0] for key in (old_price, new_price) if key is not None)
+
+    for category_id in set(deltas) | stale_min:
+        product_delta, in_stock_delta = deltas.get(category_id, (0, 0))
+        updates = {}
+        if product_delta:
+            updates['product_count'] = F('product_count') + product_delta
+        if in_stock_delta:
+            updates['in_stock_count'] = F('in_stock_count') + in_stock_delta
+        if category_id in stale_min:
+            updates['min_price'] = _min_price(category_id)
+        if updates:
+            Category.objects.filter(pk=category_id).update(**updates)
+
+
+def rebuild(category_ids=None):
+    """
+    Recompute the counters from the product table.
+
+    Returns the number of categories whose stored counters had drifted.
+    """
+    categories = Category.objects.all()
+    products = Product.objects.filter(is_active=True)
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+        products = products.filter(category_id__in=category_ids)
+
+    actual = {
+        row['category_id']: (row['total'], row['in_stock'], row['min_price'])
+        for row in products.values('category_id').annotate(
+            total=Count('id'),
+            in_stock=Count('id', filter=Q(stock__gt=0)),
+            min_price=Min('price'),
+        )
+    }
+
+    with transaction.atomic():
+        drifted = []
+        for category in categories.select_for_update().only('pk', *COUNTER_FIELDS):
+            values = actual.get(category.pk, (0, 0, None))
+            if (category.product_count, category.in_stock_count, category.min_price) != values:
+                category.product_count, category.in_stock_count, category.min_price = values
+                drifted.append(category)
+        Category.objects.bulk_update(drifted, COUNTER_FIELDS, batch_size=500)
+    return len(drifted)
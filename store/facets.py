@@ -0,0 +1,149 @@
+"""
+Precomputed facet counts for category listings.
+
+Each category keeps one CategoryFacet row per facet value (price range and
+availability) holding the number of active products with that value.  The
+rows are adjusted incrementally from the Product signals, so rendering the
+facet sidebar is a single small read instead of a GROUP BY over the whole
+category on every page view.
+"""
+from collections import Counter, namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import CategoryFacet, Product
+
+
+AVAILABILITY = 'availability'
+PRICE = 'price'
+
+ALL = 'all'
+IN_STOCK = 'in_stock'
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_RANGES = [
+    ('under-100', 'Under ₹100', None, Decimal('100')),
+    ('100-250', '₹100 - ₹250', Decimal('100'), Decimal('250')),
+    ('250-500', '₹250 - ₹500', Decimal('250'), Decimal('500')),
+    ('500-1000', '₹500 - ₹1000', Decimal('500'), Decimal('1000')),
+    ('1000-plus', 'Over ₹1000', Decimal('1000'), None),
+]
+
+SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+}
+
+SORT_LABELS = [
+    ('newest', 'Newest'),
+    ('price_asc', 'Price: Low to High'),
+    ('price_desc', 'Price: High to Low'),
+]
+
+# The subset of product fields that facet counts depend on
+ProductState = namedtuple('ProductState', ['category_id', 'price', 'stock', 'is_active'])
+
+
+def price_range_key(price):
+    """Return the key of the price range containing ``price``"""
+    price = Decimal(price)
+    for key, _label, low, high in PRICE_RANGES:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return PRICE_RANGES[-1][0]
+
+
+def price_range_filter(key):
+    """Return a Q object selecting products in the given price range, or None"""
+    for range_key, _label, low, high in PRICE_RANGES:
+        if range_key == key:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    return None
+
+
+def state_of(product):
+    """Snapshot the facet-relevant fields of a product instance"""
+    return ProductState(product.category_id, product.price, product.stock, product.is_active)
+
+
+def _facet_keys(state):
+    if state is None or not state.is_active:
+        return []
+    keys = [
+        (state.category_id, AVAILABILITY, ALL),
+        (state.category_id, PRICE, price_range_key(state.price)),
+    ]
+    if state.stock > 0:
+        keys.append((state.category_id, AVAILABILITY, IN_STOCK))
+    return keys
+
+
+def apply_change(old, new):
+    """
+    Adjust facet counts for a product moving from state ``old`` to ``new``.
+
+    Either state may be None for a created or deleted product.  Only the
+    facet values that actually differ are touched, each with one UPDATE.
+    """
+    deltas = Counter()
+    for key in _facet_keys(new):
+        deltas[key] += 1
+    for key in _facet_keys(old):
+        deltas[key] -= 1
+
+    for (category_id, facet, value), delta in deltas.items():
+        if delta == 0:
+            continue
+        rows = CategoryFacet.objects.filter(category_id=category_id, facet=facet, value=value)
+        if rows.update(count=F('count') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                CategoryFacet.objects.create(category_id=category_id, facet=facet, value=value, count=delta)
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(count=F('count') + delta)
+
+
+def rebuild(category_ids=None):
+    """Recompute facet counts from the product table"""
+    products = Product.objects.filter(is_active=True)
+    facets = CategoryFacet.objects.all()
+    if category_ids is not None:
+        products = products.filter(category_id__in=category_ids)
+        facets = facets.filter(category_id__in=category_ids)
+
+    counts = Counter()
+    for row in products.values('category_id').annotate(
+        total=Count('id'),
+        in_stock=Count('id', filter=Q(stock__gt=0)),
+    ):
+        counts[(row['category_id'], AVAILABILITY, ALL)] = row['total']
+        counts[(row['category_id'], AVAILABILITY, IN_STOCK)] = row['in_stock']
+    for key, _label, _low, _high in PRICE_RANGES:
+        for row in products.filter(price_range_filter(key)).values('category_id').annotate(total=Count('id')):
+            counts[(row['category_id'], PRICE, key)] = row['total']
+
+    with transaction.atomic():
+        facets.delete()
+        CategoryFacet.objects.bulk_create([
+            CategoryFacet(category_id=category_id, facet=facet, value=value, count=count)
+            for (category_id, facet, value), count in counts.items()
+        ])
+    return len(counts)
+
+
+def facet_summary(category):
+    """Return {(facet, value): count} for a category from the precomputed rows"""
+    return {
+        (facet, value): count
+        for facet, value, count in CategoryFacet.objects.filter(category=category).values_list('facet', 'value', 'count')
+    }
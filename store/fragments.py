@@ -0,0 +1,115 @@
+"""
+Versioned HTML fragment cache for catalog pages.
+
+Product cards, category cards and the product detail body are rendered once
+and cached under a key that embeds the ``updated_at`` (and for category
+cards, the counters) of every object they show, so any save produces a new
+key and stale HTML is never looked up again.  Building image derivatives
+bumps ``updated_at`` too (see ``store.images.touch_owners``).  The
+Category, Product and ProductImage signals in ``store.signals`` also drop
+the last-good copy so deletes and image changes take effect at once.
+
+Rebuilds are single-flight: when a fragment is missing, only the worker that
+wins ``cache.add`` on a short lock renders it; the others serve the previous
+copy if there is one, or wait briefly for the winner.  Per-user content
+(messages, cart count, CSRF tokens) must never be rendered inside a
+fragment, nor may anything that changes without a save, such as the units
+other carts hold: the detail body says "In Stock" and leaves the exact
+count to the add-to-cart check.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+
+
+# Bump when fragment templates change so old HTML is not served
+FRAGMENT_VERSION = 4
+
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 20
+
+
+def _timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _stamp(value):
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y%m%d%H%M%S%f')
+    return '0' if value is None else str(value)
+
+
+def fragment_key(kind, pk, *versions):
+    """Cache key for one version of an object's fragment"""
+    stamps = '.'.join(_stamp(value) for value in versions)
+    return f'fragment:v{FRAGMENT_VERSION}:{kind}:{pk}:{stamps}'
+
+
+def _latest_key(kind, pk):
+    return f'fragment:v{FRAGMENT_VERSION}:{kind}:{pk}:latest'
+
+
+def cached_fragment(kind, pk, versions, builder):
+    """Return the fragment for (kind, pk, versions), building it at most once"""
+    key = fragment_key(kind, pk, *versions)
+    html = cache.get(key)
+    if html is not None:
+        return html
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            html = builder()
+            cache.set(key, html, _timeout())
+            cache.set(_latest_key(kind, pk), html, _timeout() * 2)
+        finally:
+            cache.delete(lock_key)
+        return html
+
+    # Another worker is rebuilding this fragment
+    stale = cache.get(_latest_key(kind, pk))
+    if stale is not None:
+        return stale
+    for _attempt in range(WAIT_ATTEMPTS):
+        time.sleep(WAIT_INTERVAL)
+        html = cache.get(key)
+        if html is not None:
+            return html
+    return builder()
+
+
+def invalidate(kind, pk):
+    """Drop the last-good copy of an object's fragment"""
+    cache.delete(_latest_key(kind, pk))
+
+
+def product_card(product):
+    return cached_fragment(
+        'product_card', product.pk, [product.updated_at],
+        lambda: render_to_string('store/includes/product_card.html', {'product': product}),
+    )
+
+
+def category_card(category):
+    # The counters are updated without touching updated_at, so they version the card too
+    return cached_fragment(
+        'category_card', category.pk,
+        [category.updated_at, category.product_count, category.in_stock_count, category.min_price],
+        lambda: render_to_string('store/includes/category_card.html', {'category': category}),
+    )
+
+
+def product_detail_body(product):
+    def build():
+        # The gallery is read twice by the template; fetch it once
+        prefetch_related_objects([product], 'images')
+        return render_to_string('store/includes/product_detail_body.html', {'product': product})
+
+    # The body shows the category breadcrumb, so the category version is part of the key
+    return cached_fragment(
+        'product_detail', product.pk, [product.updated_at, product.category.updated_at], build,
+    )
@@ -0,0 +1,155 @@
+"""
+Responsive image derivatives.
+
+Uploaded images are served at their original size, which is far more than
+a 250px grid card or an 80px cart thumbnail needs.  This module renders a
+fixed set of cropped derivatives per image in WebP and JPEG and tells
+templates where to find them.  Derivatives live next to the media tree
+under ``derivatives/`` and are named after the original file, so no
+database bookkeeping is needed:
+
+    products/belt.jfif -> derivatives/products/belt.card.webp
+                          derivatives/products/belt.card.jpg
+
+Derivatives are built by ``manage.py build_image_derivatives`` (in a
+process pool) and, whenever an image is uploaded, by a job that
+``store.signals`` queues (``store.tasks.build_image_derivatives``).
+Either way ``touch_owners`` then bumps the ``updated_at`` of the products
+and categories showing the images.  That versions out their cached
+fragments and API ETags in every process, which a cache-only marker would
+not do with a per-process cache backend.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Category, Product, ProductImage
+
+
+DERIVATIVE_ROOT = 'derivatives'
+
+# name: (width, height).  Every CSS slot uses object-fit: cover, so
+# derivatives are cropped to the box's aspect ratio.
+SIZES = {
+    'thumb': (160, 160),
+    'card': (480, 400),
+    'detail': (960, 800),
+}
+
+# Which derivatives are offered in the srcset of each size, and the
+# ``sizes`` attribute telling the browser how wide the slot is rendered.
+SRCSETS = {
+    'thumb': ['thumb'],
+    'card': ['card', 'detail'],
+    'detail': ['card', 'detail'],
+}
+SIZES_ATTR = {
+    'thumb': '80px',
+    'card': '(max-width: 768px) 50vw, 300px',
+    'detail': '(max-width: 768px) 100vw, 600px',
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, size, ext):
+    """Storage name of one derivative of the original file ``name``"""
+    base, _ext = os.path.splitext(name)
+    return f'{DERIVATIVE_ROOT}/{base}.{size}.{ext}'
+
+
+def _is_fresh(name, derivative):
+    if not default_storage.exists(derivative):
+        return False
+    try:
+        return default_storage.get_modified_time(derivative) >= default_storage.get_modified_time(name)
+    except NotImplementedError:
+        return True
+
+
+def _fit(image, box):
+    """
+    Crop ``image`` to the aspect ratio of ``box`` and scale it down to fit.
+
+    Images smaller than the box are cropped but never enlarged; the result
+    keeps the box's aspect ratio, so the width/height attributes emitted by
+    templates still reserve the right space.
+    """
+    width, height = box
+    factor = min(1, image.width / width, image.height / height)
+    target = (max(1, round(width * factor)), max(1, round(height * factor)))
+    return ImageOps.fit(image, target, Image.LANCZOS)
+
+
+def generate_derivatives(name, force=False):
+    """
+    Render every derivative of the stored image ``name``.
+
+    Returns the number of files written; derivatives newer than the
+    original are skipped unless ``force`` is set.
+    """
+    targets = [
+        (size, ext)
+        for size in SIZES
+        for ext in FORMATS
+        if force or not _is_fresh(name, derivative_name(name, size, ext))
+    ]
+    if not targets:
+        return 0
+
+    with default_storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    written = 0
+    for size, ext in targets:
+        resized = _fit(image, SIZES[size])
+        pil_format, options = FORMATS[ext]
+        buffer = BytesIO()
+        resized.save(buffer, pil_format, **options)
+        derivative = derivative_name(name, size, ext)
+        if default_storage.exists(derivative):
+            default_storage.delete(derivative)
+        default_storage.save(derivative, ContentFile(buffer.getvalue()))
+        written += 1
+    return written
+
+
+def has_derivatives(name):
+    """Whether the derivatives of ``name`` have been generated"""
+    return default_storage.exists(derivative_name(name, 'detail', 'jpg'))
+
+
+def touch_owners(names):
+    """Bump ``updated_at`` of every product and category showing one of the images ``names``"""
+    names = list(names)
+    if not names:
+        return
+    now = timezone.now()
+    Product.objects.filter(main_image__in=names).update(updated_at=now)
+    Product.objects.filter(pk__in=ProductImage.objects.filter(image__in=names).values('product_id')).update(updated_at=now)
+    Category.objects.filter(image__in=names).update(updated_at=now)
+
+
+def derivative_url(field_file, size, ext='jpg'):
+    """URL of one derivative, falling back to the original if it is missing"""
+    if not field_file:
+        return ''
+    if not has_derivatives(field_file.name):
+        return field_file.url
+    return default_storage.url(derivative_name(field_file.name, size, ext))
+
+
+def srcset(field_file, size, ext):
+    """``srcset`` attribute value offering the derivatives for ``size``"""
+    return ', '.join(
+        f'{default_storage.url(derivative_name(field_file.name, name, ext))} {SIZES[name][0]}w'
+        for name in SRCSETS[size]
+    )
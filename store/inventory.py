@@ -0,0 +1,67 @@
+"""
+Guarded stock writes.
+
+``decrement`` takes stock for any number of products with one conditional
+UPDATE,
+
+    UPDATE product SET stock = stock - CASE id WHEN ... END
+     WHERE id IN (...) AND stock >= CASE id WHEN ... END [+ floor]
+
+instead of a read-modify-write ``product.save()`` per product: each row is
+locked only for the statement itself, two buyers can never both take the
+last unit, and the cost does not grow with a query per line.  If any
+guard fails, ``OutOfStock`` names the products so the caller's transaction
+can roll the others back.
+
+Queryset updates bypass the Product signals, so the facet and category
+counters are adjusted here from the rows read back after the write; that
+only touches them for products that ran out.
+"""
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import counters, facets, fragments
+from .models import Product
+
+
+class OutOfStock(Exception):
+    """Some products did not have the requested stock; ``product_ids`` lists them"""
+
+    def __init__(self, product_ids):
+        super().__init__(f'Not enough stock for products {sorted(product_ids)}')
+        self.product_ids = product_ids
+
+
+def decrement(quantities, floor=None):
+    """
+    Take ``quantities`` ({product_id: n}) out of stock.
+
+    ``floor`` is an optional expression, evaluated per product row, that
+    the remaining stock must not drop below (e.g. the units other carts
+    hold).  Raises OutOfStock if any guard failed; run it inside a
+    transaction so the successful decrements roll back too.
+    """
+    if not quantities:
+        return
+    now = timezone.now()
+    quantity = Case(
+        *[When(pk=product_id, then=Value(n)) for product_id, n in quantities.items()],
+        output_field=IntegerField(),
+    )
+    guard = quantity if floor is None else quantity + floor
+    updated = Product.objects.filter(pk__in=quantities, stock__gte=guard).update(
+        stock=F('stock') - quantity, updated_at=now,
+    )
+    if updated != len(quantities):
+        # Rows that passed the guard carry this write's timestamp
+        taken = set(Product.objects.filter(pk__in=quantities, updated_at=now).values_list('pk', flat=True))
+        raise OutOfStock([product_id for product_id in quantities if product_id not in taken])
+
+    fields = ['pk', *facets.ProductState._fields]
+    for row in Product.objects.filter(pk__in=quantities).values_list(*fields):
+        product_id, state = row[0], facets.ProductState(*row[1:])
+        previous = state._replace(stock=state.stock + quantities[product_id])
+        facets.apply_change(previous, state)
+        counters.apply_change(previous, state)
+        fragments.invalidate('product_card', product_id)
+        fragments.invalidate('product_detail', product_id)
@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from store.images import generate_derivatives, touch_owners
+from store.models import Category, Product, ProductImage
+
+
+def _build(name, force):
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except Exception as exc:
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail, card and detail derivatives for every catalog image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Rebuild derivatives that are already up to date')
+
+    def handle(self, *args, **options):
+        names = set()
+        names.update(Product.objects.exclude(main_image='').exclude(main_image__isnull=True).values_list('main_image', flat=True))
+        names.update(ProductImage.objects.exclude(image='').values_list('image', flat=True))
+        names.update(Category.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+
+        started = time.monotonic()
+        written = failed = 0
+        built = []
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = [pool.submit(_build, name, options['force']) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, count, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                written += count
+                if count:
+                    built.append(name)
+
+        # Cached fragments and API ETags of the owners still point at the
+        # original images; a new updated_at versions them out in every process
+        touch_owners(built)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(names)} images, wrote {written} derivatives in {elapsed:.1f}s ({failed} failed).'
+        ))
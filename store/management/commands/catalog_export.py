@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from store.catalog_io import detect_format, export_rows, write_rows
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Export products as a CSV or JSON Lines feed, streaming the table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--category', help='Only export this category (slug)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        queryset = Product.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category__slug=options['category'])
+
+        rows = export_rows(queryset, chunk_size=options['chunk_size'])
+        if path == '-':
+            write_rows(self.stdout, fmt, rows)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            write_rows(handle, fmt, rows)
+        self.stderr.write(self.style.SUCCESS(f'Exported catalog to {path}.'))
@@ -0,0 +1,63 @@
+import itertools
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalog_io import CatalogImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV or JSON Lines feed in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Create categories that do not exist yet instead of rejecting the row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        chunk_size = options['chunk_size']
+        importer = CatalogImporter(create_categories=options['create_categories'])
+
+        started = time.monotonic()
+        try:
+            handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        try:
+            with handle:
+                rows = read_rows(handle, fmt)
+                # Line numbers account for the CSV header row
+                line = 2 if fmt == 'csv' else 1
+                while True:
+                    chunk = list(itertools.islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    importer.import_chunk(chunk, first_line=line)
+                    line += len(chunk)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{importer.created + importer.updated} products written...')
+        finally:
+            # Chunks already committed must not leave the facet and category counts behind
+            importer.finish()
+
+        for line, error in importer.errors[:50]:
+            self.stderr.write(f'line {line}: {error}')
+        if len(importer.errors) > 50:
+            self.stderr.write(f'... and {len(importer.errors) - 50} more errors')
+
+        elapsed = time.monotonic() - started
+        total = importer.created + importer.updated + importer.unchanged
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {importer.created}, updated {importer.updated}, unchanged {importer.unchanged}, '
+            f'skipped {len(importer.errors)} '
+            f'in {elapsed:.1f}s ({rate:.0f} products/s).'
+        ))
+        if importer.created or importer.updated:
+            self.stdout.write('Run build_image_derivatives to render responsive images for new uploads.')
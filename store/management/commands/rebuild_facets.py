@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store import facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed category facet counts from the product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category_ids', nargs='*', type=int, help='Only rebuild these categories')
+
+    def handle(self, *args, **options):
+        category_ids = options['category_ids'] or None
+        rows = facets.rebuild(category_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} facet counts.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Product
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        indexed = 0
+
+        with transaction.atomic():
+            backend.clear()
+            batch = []
+            for product in Product.objects.only('id', 'name', 'description').order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    backend.index_many(batch)
+                    indexed += len(batch)
+                    batch = []
+            if batch:
+                backend.index_many(batch)
+                indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products using the {backend.name} backend.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from store import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized category product/stock counters and minimum prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category_ids', nargs='*', type=int, help='Only reconcile these categories')
+
+    def handle(self, *args, **options):
+        category_ids = options['category_ids'] or None
+        drifted = counters.rebuild(category_ids)
+        if drifted:
+            self.stdout.write(self.style.WARNING(f'Repaired counters of {drifted} categories.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Category counters are in step.'))
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+
+# A frozen copy of the tokenizer and weights in store.search, so that this
+# migration keeps working however store.search changes.  An index built
+# with older rules is refreshed by `manage.py rebuild_search_index`.
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+])
+NAME_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def product_token_weights(name, description):
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def build_search_index(apps, schema_editor):
+    """
+    Index existing products.
+
+    On SQLite builds with FTS5 the virtual table is created and filled;
+    otherwise the portable inverted index table is filled instead.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts "
+                "USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            pass
+        else:
+            schema_editor.execute(
+                "INSERT INTO store_product_fts (rowid, name, description) "
+                "SELECT id, name, description FROM store_product"
+            )
+            return
+
+    Product = apps.get_model('store', 'Product')
+    SearchIndexEntry = apps.get_model('store', 'SearchIndexEntry')
+    entries = []
+    for product_id, name, description in Product.objects.values_list('id', 'name', 'description').iterator():
+        for token, weight in product_token_weights(name, description).items():
+            entries.append(SearchIndexEntry(token=token, product_id=product_id, weight=weight))
+        if len(entries) >= 1000:
+            SearchIndexEntry.objects.bulk_create(entries)
+            entries = []
+    SearchIndexEntry.objects.bulk_create(entries)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_category_listing_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='store.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Search index entries',
+                'unique_together': {('token', 'product')},
+            },
+        ),
+        migrations.RunPython(build_search_index, drop_fts_table),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+# A frozen copy of the facet names and price ranges in store.facets, so that
+# this migration keeps working however store.facets changes.  Counts built
+# with older ranges are refreshed by `manage.py rebuild_facets`.
+AVAILABILITY = 'availability'
+PRICE = 'price'
+ALL = 'all'
+IN_STOCK = 'in_stock'
+# (key, lower bound inclusive, upper bound exclusive)
+PRICE_RANGES = [
+    ('under-100', None, Decimal('100')),
+    ('100-250', Decimal('100'), Decimal('250')),
+    ('250-500', Decimal('250'), Decimal('500')),
+    ('500-1000', Decimal('500'), Decimal('1000')),
+    ('1000-plus', Decimal('1000'), None),
+]
+
+
+def price_range_filter(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def fill_category_facets(apps, schema_editor):
+    """Compute facet counts for the existing catalog"""
+    Product = apps.get_model('store', 'Product')
+    CategoryFacet = apps.get_model('store', 'CategoryFacet')
+    products = Product.objects.filter(is_active=True)
+    facets = []
+    for row in products.values('category_id').annotate(total=Count('id'), in_stock=Count('id', filter=Q(stock__gt=0))):
+        facets.append(CategoryFacet(category_id=row['category_id'], facet=AVAILABILITY, value=ALL, count=row['total']))
+        facets.append(CategoryFacet(category_id=row['category_id'], facet=AVAILABILITY, value=IN_STOCK, count=row['in_stock']))
+    for key, low, high in PRICE_RANGES:
+        for row in products.filter(price_range_filter(low, high)).values('category_id').annotate(total=Count('id')):
+            facets.append(CategoryFacet(category_id=row['category_id'], facet=PRICE, value=key, count=row['total']))
+    CategoryFacet.objects.bulk_create(facets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', 'price', 'id'], name='product_category_price_idx'),
+        ),
+        migrations.AddField(
+            model_name='categoryfacet',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='store.category'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='categoryfacet',
+            unique_together={('category', 'facet', 'value')},
+        ),
+        migrations.RunPython(fill_category_facets, migrations.RunPython.noop),
+    ]
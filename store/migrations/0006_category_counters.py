@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+def fill_category_counters(apps, schema_editor):
+    """Compute the counters for the existing catalog"""
+    from django.db.models import Count, Min, Q
+
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+    for row in Product.objects.filter(is_active=True).values('category_id').annotate(
+        total=Count('id'), in_stock=Count('id', filter=Q(stock__gt=0)), lowest=Min('price'),
+    ):
+        Category.objects.filter(pk=row['category_id']).update(
+            product_count=row['total'], in_stock_count=row['in_stock'], min_price=row['lowest'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_product_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='in_stock_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_category_counters, migrations.RunPython.noop),
+    ]
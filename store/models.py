@@ -8,6 +8,10 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Denormalized from the active products; maintained by store.counters
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    in_stock_count = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -42,10 +46,32 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs the keyset-paginated category listing (newest first)
+            models.Index(
+                fields=['category', 'is_active', '-created_at', '-id'],
+                name='product_category_listing_idx',
+            ),
+            # Backs the price-sorted and price-filtered category listing
+            models.Index(
+                fields=['category', 'is_active', 'price', 'id'],
+                name='product_category_price_idx',
+            ),
+            # Backs the max(updated_at) behind the catalog API's ETags
+            models.Index(fields=['category', 'updated_at'], name='product_category_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so signal handlers can work out what
+        # changed on save without reading the row back.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -68,3 +94,49 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.product.name} - Image {self.id}"
 
+
+
+class SearchIndexEntry(models.Model):
+    """Inverted index entry mapping a search token to a product"""
+    token = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_entries')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name_plural = "Search index entries"
+        unique_together = ['token', 'product']
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id} ({self.weight})"
+
+
+class CategoryFacet(models.Model):
+    """Precomputed count of active products per category facet value"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets')
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['category', 'facet', 'value']
+
+    def __str__(self):
+        return f"{self.category} {self.facet}={self.value}: {self.count}"
+
+
+class ProductNeighbor(models.Model):
+    """Precomputed "frequently bought together" neighbour of a product"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ['product', 'neighbor']
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='product_neighbor_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbor_id} ({self.score:.3f})"
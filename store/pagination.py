@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Offset pagination makes the database walk and discard every row before the
+requested page, so deep pages get slower as a listing grows.  Keyset
+pagination instead remembers the sort key of the last row that was shown and
+asks for rows "after" it, which an index on the sort columns answers with a
+single range scan no matter how deep the page is.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 24
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'has_next'])
+
+
+def encode_cursor(values):
+    """Encode the sort key of a row into an opaque, URL-safe cursor"""
+    payload = json.dumps(
+        [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering=DEFAULT_ORDERING):
+    """
+    Decode a cursor into a list of sort key values for ``ordering``.
+
+    Returns None if the cursor is missing, malformed or does not match the
+    ordering, so a tampered cursor simply restarts the listing.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(raw_values, list) or len(raw_values) != len(ordering):
+        return None
+
+    values = []
+    for field_name, raw in zip(ordering, raw_values):
+        field = model._meta.get_field(field_name.lstrip('-'))
+        try:
+            value = field.to_python(raw)
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        values.append(value)
+    return values
+
+
+def _after(ordering, values):
+    """Build a filter matching rows that sort after ``values``"""
+    condition = Q()
+    equal_prefix = Q()
+    for field_name, value in zip(ordering, values):
+        name = field_name.lstrip('-')
+        lookup = 'lt' if field_name.startswith('-') else 'gt'
+        condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+        equal_prefix &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, cursor=None, per_page=DEFAULT_PAGE_SIZE, ordering=DEFAULT_ORDERING):
+    """
+    Return one page of ``queryset`` sorted by ``ordering``.
+
+    ``ordering`` must end with a unique column (normally ``id``) so that rows
+    sharing a sort value still have a stable position.  One extra row is
+    fetched to find out whether another page follows without a COUNT query.
+    """
+    queryset = queryset.order_by(*ordering)
+    position = decode_cursor(cursor, queryset.model, ordering)
+    if position is not None:
+        queryset = queryset.filter(_after(ordering, position))
+
+    items = list(queryset[:per_page + 1])
+    has_next = len(items) > per_page
+    items = items[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip('-')) for name in ordering])
+    return KeysetPage(items, next_cursor, has_next)
@@ -0,0 +1,206 @@
+"""
+Product search.
+
+Products are tokenized into an inverted index so that a query only touches
+the index rows for its own tokens instead of scanning every product with
+``icontains``.  Two interchangeable backends are provided:
+
+* ``FTS5SearchBackend`` uses an SQLite FTS5 virtual table with bm25 ranking.
+* ``InvertedIndexSearchBackend`` uses the portable ``SearchIndexEntry`` table
+  and ranks by summed token weight.
+
+``get_search_backend()`` picks FTS5 when the virtual table exists, unless
+``settings.STORE_SEARCH_BACKEND`` forces one ('fts5' or 'inverted').  The
+index is kept current by the Product signals in ``store.signals``.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Product, SearchIndexEntry
+
+
+FTS_TABLE = 'store_product_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+])
+
+# Relative importance of a token found in each field
+NAME_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text):
+    """Split text into lowercase search tokens, dropping stop words"""
+    tokens = []
+    for token in TOKEN_RE.findall((text or '').lower()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(token[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def product_token_weights(name, description):
+    """Return {token: weight} for a product's searchable fields"""
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+class InvertedIndexSearchBackend:
+    """Search backend using the portable SearchIndexEntry table"""
+    name = 'inverted'
+
+    def _entries_for(self, product_id, name, description):
+        return [
+            SearchIndexEntry(token=token, product_id=product_id, weight=weight)
+            for token, weight in product_token_weights(name, description).items()
+        ]
+
+    def index(self, product):
+        """Replace the index entries of a single product"""
+        SearchIndexEntry.objects.filter(product_id=product.pk).delete()
+        SearchIndexEntry.objects.bulk_create(
+            self._entries_for(product.pk, product.name, product.description)
+        )
+
+    def index_many(self, products):
+        """Replace the index entries of many products at once"""
+        products = list(products)
+        SearchIndexEntry.objects.filter(product_id__in=[p.pk for p in products]).delete()
+        entries = []
+        for product in products:
+            entries.extend(self._entries_for(product.pk, product.name, product.description))
+        SearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+
+    def remove(self, product_id):
+        SearchIndexEntry.objects.filter(product_id=product_id).delete()
+
+    def clear(self):
+        SearchIndexEntry.objects.all().delete()
+
+    def _matches(self, tokens):
+        return (
+            SearchIndexEntry.objects.filter(token__in=tokens)
+            .values('product_id')
+            .annotate(matched=Count('token'), score=Sum('weight'))
+            .filter(matched=len(tokens))
+        )
+
+    def search(self, query, limit=None, active_only=True):
+        """Return ids of products matching every query token, best first"""
+        tokens = sorted(set(tokenize(query)))
+        if not tokens:
+            return []
+        matches = self._matches(tokens)
+        if active_only:
+            matches = matches.filter(product__is_active=True)
+        matches = matches.order_by('-score', '-product_id').values_list('product_id', flat=True)
+        if limit is not None:
+            matches = matches[:limit]
+        return list(matches)
+
+    def filter(self, queryset, query):
+        """Restrict a Product queryset to matches, without ranking"""
+        tokens = sorted(set(tokenize(query)))
+        if not tokens:
+            return queryset.none()
+        return queryset.filter(id__in=self._matches(tokens).values('product_id'))
+
+
+class FTS5SearchBackend:
+    """Search backend using an SQLite FTS5 virtual table keyed by product id"""
+    name = 'fts5'
+
+    def _match_expression(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # Quote every token so FTS5 operators in user input are inert, and
+        # prefix-match the last one so partially typed words still match.
+        terms = [f'"{token}"' for token in tokens[:-1]]
+        terms.append(f'"{tokens[-1]}"*')
+        return ' '.join(terms)
+
+    def index(self, product):
+        self.index_many([product])
+
+    def index_many(self, products):
+        rows = [(p.pk, p.name, p.description) for p in products]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query, limit=None, active_only=True):
+        expression = self._match_expression(query)
+        if expression is None:
+            return []
+        sql = (
+            f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+            f'JOIN {Product._meta.db_table} p ON p.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s'
+        )
+        if active_only:
+            sql += ' AND p.is_active'
+        sql += f' ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}.0, {DESCRIPTION_WEIGHT}.0), p.id DESC'
+        params = [expression]
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, query):
+        expression = self._match_expression(query)
+        if expression is None:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]
+        ))
+
+
+@lru_cache(maxsize=None)
+def _fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_search_backend():
+    """Return the configured search backend"""
+    choice = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if choice == 'inverted':
+        return InvertedIndexSearchBackend()
+    if choice == 'fts5' or _fts5_available():
+        return FTS5SearchBackend()
+    return InvertedIndexSearchBackend()
+
+
+def search_products(query, limit=48):
+    """Return active products matching ``query``, best match first"""
+    ids = get_search_backend().search(query, limit=limit)
+    products = Product.objects.filter(id__in=ids).select_related('category').in_bulk()
+    return [products[pk] for pk in ids if pk in products]
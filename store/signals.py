@@ -0,0 +1,89 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from jobs.queue import enqueue_once
+from . import counters, facets, fragments, images, tasks
+from .models import Category, Product, ProductImage
+from .search import get_search_backend
+
+# Sent with ``product_ids`` whenever product prices change, including bulk
+# writes that bypass the model signals (e.g. the catalog importer).
+product_prices_changed = Signal()
+
+
+def _queue_derivatives(field_file):
+    """Queue a job rendering the responsive derivatives of a newly uploaded image"""
+    if not field_file or images.has_derivatives(field_file.name):
+        return
+    # Resizing is slow, so it never runs in the request that saved the image
+    enqueue_once(tasks.build_image_derivatives, name=field_file.name)
+
+
+def _loaded_state(instance, default=None):
+    """Return the facet state the product row had before this save or delete"""
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if all(name in loaded for name in facets.ProductState._fields):
+        return facets.ProductState(*(loaded[name] for name in facets.ProductState._fields))
+    # Not loaded from the database, or loaded with deferred fields
+    row = Product.objects.filter(pk=instance.pk).values_list(*facets.ProductState._fields).first()
+    return facets.ProductState(*row) if row else default
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    """Capture the pre-save state so post_save can compute deltas"""
+    instance._previous_state = None if instance.pk is None else _loaded_state(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """Keep the search index, facet and category counts and fragments in step with product edits"""
+    get_search_backend().index(instance)
+    fragments.invalidate('product_card', instance.pk)
+    fragments.invalidate('product_detail', instance.pk)
+    if not kwargs.get('raw'):
+        _queue_derivatives(instance.main_image)
+
+    previous, current = getattr(instance, '_previous_state', None), facets.state_of(instance)
+    facets.apply_change(previous, current)
+    counters.apply_change(previous, current)
+    if previous is not None and previous.price != current.price:
+        product_prices_changed.send(sender=Product, product_ids=[instance.pk])
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields
+    }
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    """Drop deleted products from the search index, facet and category counts and fragments"""
+    get_search_backend().remove(instance.pk)
+    fragments.invalidate('product_card', instance.pk)
+    fragments.invalidate('product_detail', instance.pk)
+
+    # The row is already gone, so fall back to the instance's own values
+    previous = _loaded_state(instance, default=facets.state_of(instance))
+    facets.apply_change(previous, None)
+    counters.apply_change(previous, None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Drop cached category cards; the new updated_at also versions them out"""
+    fragments.invalidate('category_card', instance.pk)
+    if kwargs['signal'] is post_save and not kwargs.get('raw'):
+        _queue_derivatives(instance.image)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, **kwargs):
+    """
+    Bump the owning product's updated_at so its cached fragments are
+    versioned out, without re-running the Product save signals.
+    """
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+    fragments.invalidate('product_detail', instance.product_id)
+    if kwargs['signal'] is post_save and not kwargs.get('raw'):
+        _queue_derivatives(instance.image)
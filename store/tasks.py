@@ -0,0 +1,8 @@
+"""Background tasks of the store app, queued with jobs.queue.enqueue"""
+from . import images
+
+
+def build_image_derivatives(name):
+    """Render the responsive derivatives of an uploaded image and version out the pages showing it"""
+    if images.generate_derivatives(name):
+        images.touch_owners([name])
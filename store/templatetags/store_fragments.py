@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from store import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_card(product):
+    """Render a cached product card"""
+    return mark_safe(fragments.product_card(product))
+
+
+@register.simple_tag
+def category_card(category):
+    """Render a cached category card"""
+    return mark_safe(fragments.category_card(category))
+
+
+@register.simple_tag
+def product_detail_body(product):
+    """Render the cached body of the product detail page"""
+    return mark_safe(fragments.product_detail_body(product))
@@ -0,0 +1,44 @@
+from django import template
+from django.utils.html import format_html
+
+from store import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, size, alt='', css_class='', lazy=True, element_id=''):
+    """
+    Render a <picture> offering WebP and JPEG derivatives of an image.
+
+    Falls back to a plain <img> of the original until the derivatives
+    have been generated.
+    """
+    if not field_file:
+        return ''
+    id_attr = format_html(' id="{}"', element_id) if element_id else ''
+    loading = 'lazy' if lazy else 'eager'
+
+    if not images.has_derivatives(field_file.name):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}"{} loading="{}">',
+            field_file.url, alt, css_class, id_attr, loading,
+        )
+
+    width, height = images.SIZES[size]
+    sizes = images.SIZES_ATTR[size]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}"{} loading="{}" decoding="async">'
+        '</picture>',
+        images.srcset(field_file, size, 'webp'), sizes,
+        images.derivative_url(field_file, size), images.srcset(field_file, size, 'jpg'), sizes,
+        width, height, alt, css_class, id_attr, loading,
+    )
+
+
+@register.simple_tag
+def derivative_url(field_file, size):
+    """URL of a single JPEG derivative, for scripts that swap image sources"""
+    return images.derivative_url(field_file, size)
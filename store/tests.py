@@ -0,0 +1,23 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import Category, Product
+
+
+class CatalogExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        for name in ('First Book', 'Second Book'):
+            Product.objects.create(name=name, price='10.00', stock=3, category=category)
+
+    def test_jsonl_to_stdout_has_one_record_per_line(self):
+        out = StringIO()
+        call_command('catalog_export', '-', format='jsonl', stdout=out)
+        lines = out.getvalue().split('\n')
+        self.assertEqual(lines[-1], '')
+        rows = [json.loads(line) for line in lines[:-1]]
+        self.assertEqual([row['name'] for row in rows], ['First Book', 'Second Book'])
@@ -1,11 +1,17 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'store'
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('search/', views.search, name='search'),
     path('category/<slug:slug>/', views.category_products, name='category_products'),
+    path('category/<slug:slug>/products.json', views.category_products_json, name='category_products_json'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('api/categories/', api.categories, name='api_categories'),
+    path('api/categories/<slug:slug>/products/', api.category_products, name='api_category_products'),
+    path('api/products/', api.products, name='api_products'),
+    path('api/products/<slug:slug>/', api.product_detail, name='api_product_detail'),
 ]
 
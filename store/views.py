@@ -1,8 +1,15 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse, QueryDict
 from django.db.models import Q
-from .models import Category, Product
+from django.urls import reverse
+from pykart.querycount import query_budget
+from . import facets, images
+from .models import Category, Product, ProductNeighbor
+from .pagination import keyset_page
+from .search import search_products
 
 
+@query_budget(4)
 def home(request):
     """Home page displaying all categories"""
     categories = Category.objects.all()
@@ -12,25 +19,131 @@ def home(request):
     return render(request, 'store/home.html', context)
 
 
+def _category_listing(request, category, queryset=None):
+    """Apply the facet filters and sort from the query string and fetch one page"""
+    price = request.GET.get('price', '')
+    in_stock = request.GET.get('in_stock') == '1'
+    sort = request.GET.get('sort', 'newest')
+    if sort not in facets.SORT_ORDERINGS:
+        sort = 'newest'
+
+    products = (queryset if queryset is not None else Product.objects.all()).filter(category=category, is_active=True)
+    price_filter = facets.price_range_filter(price)
+    if price_filter is not None:
+        products = products.filter(price_filter)
+    else:
+        price = ''
+    if in_stock:
+        products = products.filter(stock__gt=0)
+
+    page = keyset_page(products, cursor=request.GET.get('cursor'), ordering=facets.SORT_ORDERINGS[sort])
+    filters = {'price': price, 'in_stock': in_stock, 'sort': sort}
+    return page, filters
+
+
+def _listing_query(filters, **overrides):
+    """Build a query string for the category listing, keeping the active filters"""
+    params = QueryDict(mutable=True)
+    values = {**filters, **overrides}
+    if values.get('price'):
+        params['price'] = values['price']
+    if values.get('in_stock'):
+        params['in_stock'] = '1'
+    if values.get('sort') and values['sort'] != 'newest':
+        params['sort'] = values['sort']
+    if values.get('fields'):
+        params['fields'] = values['fields']
+    if values.get('cursor'):
+        params['cursor'] = values['cursor']
+    return params.urlencode()
+
+
+@query_budget(6)
 def category_products(request, slug):
     """Display products for a specific category"""
     category = get_object_or_404(Category, slug=slug)
-    products = Product.objects.filter(category=category, is_active=True)
+    page, filters = _category_listing(request, category)
+    summary = facets.facet_summary(category)
+
+    price_options = [
+        {
+            'key': key,
+            'label': label,
+            'count': summary.get((facets.PRICE, key), 0),
+            'selected': filters['price'] == key,
+            'query': _listing_query(filters, price='' if filters['price'] == key else key),
+        }
+        for key, label, _low, _high in facets.PRICE_RANGES
+    ]
+    sort_options = [
+        {
+            'key': key,
+            'label': label,
+            'selected': filters['sort'] == key,
+            'query': _listing_query(filters, sort=key),
+        }
+        for key, label in facets.SORT_LABELS
+    ]
     
     context = {
         'category': category,
-        'products': products,
+        'products': page.items,
+        'next_cursor': page.next_cursor,
+        'filters': filters,
+        'price_options': price_options,
+        'sort_options': sort_options,
+        'total_count': summary.get((facets.AVAILABILITY, facets.ALL), 0),
+        'in_stock_count': summary.get((facets.AVAILABILITY, facets.IN_STOCK), 0),
+        'in_stock_query': _listing_query(filters, in_stock=not filters['in_stock']),
+        'next_query': _listing_query(filters, cursor=page.next_cursor) if page.has_next else None,
     }
     return render(request, 'store/category_products.html', context)
 
 
+@query_budget(5)
+def category_products_json(request, slug):
+    """JSON variant of the category listing, used for infinite scroll"""
+    category = get_object_or_404(Category, slug=slug)
+    page, filters = _category_listing(request, category)
+
+    next_url = None
+    if page.has_next:
+        next_url = f"{reverse('store:category_products_json', kwargs={'slug': slug})}?{_listing_query(filters, cursor=page.next_cursor)}"
+
+    return JsonResponse({
+        'products': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'slug': product.slug,
+                'price': str(product.price),
+                'in_stock': product.stock > 0,
+                'image': images.derivative_url(product.main_image, 'card') or None,
+                'url': product.get_absolute_url(),
+            }
+            for product in page.items
+        ],
+        'next_cursor': page.next_cursor,
+        'next': next_url,
+    })
+
+
+@query_budget(8)
 def product_detail(request, slug):
     """Display product detail page"""
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_active=True
-    ).exclude(id=product.id)[:4]
+    product = get_object_or_404(Product.objects.select_related('category'), slug=slug, is_active=True)
+
+    # Products frequently bought together, precomputed from order history
+    related_products = [
+        entry.neighbor
+        for entry in ProductNeighbor.objects.filter(product=product, neighbor__is_active=True)
+        .select_related('neighbor')[:4]
+    ]
+    if not related_products:
+        related_products = Product.objects.filter(
+            category=product.category,
+            is_active=True
+        ).exclude(id=product.id)[:4]
     
     context = {
         'product': product,
@@ -38,3 +151,15 @@ def product_detail(request, slug):
     }
     return render(request, 'store/product_detail.html', context)
 
+
+@query_budget(6)
+def search(request):
+    """Search active products by name and description"""
+    query = request.GET.get('q', '').strip()
+    products = search_products(query) if query else []
+
+    context = {
+        'query': query,
+        'products': products,
+    }
+    return render(request, 'store/search.html', context)